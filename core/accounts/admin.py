@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Profile
+from .models import User, Profile, OutboxEmail
 
 
 class CustomUserAdmin(UserAdmin):
@@ -39,5 +39,15 @@ class CustomUserAdmin(UserAdmin):
     )
 
 
+class ProfileAdmin(admin.ModelAdmin):
+    list_select_related = ["user"]
+
+
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ("subject", "to", "status", "attempts", "creation_date")
+    list_filter = ("status",)
+
+
 admin.site.register(User, CustomUserAdmin)
-admin.site.register(Profile)
+admin.site.register(Profile, ProfileAdmin)
+admin.site.register(OutboxEmail, OutboxEmailAdmin)
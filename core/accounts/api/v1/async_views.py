@@ -0,0 +1,35 @@
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.http import JsonResponse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.async_views import AsyncApiView
+from accounts.emails import queue_email
+from .serializers import RegistrationSerializer
+
+
+class AsyncRegistrationApiView(AsyncApiView):
+    """
+    async variant of RegistrationApiView, the validation and the creation
+    of the user run in one sync_to_async call and the activation email goes
+    to the outbox
+    """
+
+    async def post(self, request):
+        email = await sync_to_async(self.register)(self.get_data(request))
+        return JsonResponse({"email": email}, status=status.HTTP_201_CREATED)
+
+    def register(self, data):
+        serializer = RegistrationSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            user = serializer.save()
+            token = str(RefreshToken.for_user(user).access_token)
+            queue_email(
+                "email/activation.tpl",
+                {"token": token},
+                "farimahtizghadam@gmail.com",
+                [user.email],
+            )
+        return user.email
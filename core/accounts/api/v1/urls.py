@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import views, async_views
 from rest_framework_simplejwt.views import (
     TokenRefreshView,
     TokenVerifyView,
@@ -9,6 +9,11 @@ app_name = "api-V1"
 
 urlpatterns = [
     path("registration/", views.RegistrationApiView.as_view(), name="registration"),
+    path(
+        "async/registration/",
+        async_views.AsyncRegistrationApiView.as_view(),
+        name="async-registration",
+    ),
     path("token/login/", views.CustomAuthToken.as_view(), name="token-login"),
     path("token/logout/", views.CustomDiscardAuthToken.as_view(), name="token-logout"),
     # jwt path
@@ -16,10 +16,11 @@ from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import get_user_model
 from accounts.models import Profile
 from django.shortcuts import get_object_or_404
+from django.http import Http404
 from django.conf import settings
 from rest_framework_simplejwt.views import TokenObtainPairView
-from mail_templated import EmailMessage
-from ..utils import EmailThread
+from django.db import transaction
+from accounts.emails import queue_email
 from rest_framework_simplejwt.tokens import RefreshToken
 import jwt
 from jwt.exceptions import ExpiredSignatureError, InvalidSignatureError
@@ -39,18 +40,18 @@ class RegistrationApiView(generics.GenericAPIView):
         """
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
-        email = serializer.validated_data["email"]
+        # the activation email is in the outbox only if the user is created
+        with transaction.atomic():
+            user = serializer.save()
+            email = user.email
+            token = self.get_token_for_user(user)
+            queue_email(
+                "email/activation.tpl",
+                {"token": token},
+                "farimahtizghadam@gmail.com",
+                [email],
+            )
         data = {"email": email}
-        user = get_object_or_404(User, email=email)
-        token = self.get_token_for_user(user)
-        email_obj = EmailMessage(
-            "email/activation.tpl",
-            {"token": token},
-            "farimahtizghadam@gmail.com",
-            to=[email],
-        )
-        EmailThread(email_obj).start()
         return Response(data, status=status.HTTP_201_CREATED)
 
     def get_token_for_user(self, user):
@@ -126,13 +127,12 @@ class ResetPasswordApiView(generics.GenericAPIView):
         serializer.is_valid(raise_exception=True)
         user_obj = serializer.validated_data["user"]
         token = self.get_token_for_user(user_obj)
-        email_obj = EmailMessage(
+        queue_email(
             "email/reset.tpl",
             {"token": token},
             "farimahtizghadam@gmail.com",
-            to=[user_obj.email],
+            [user_obj.email],
         )
-        EmailThread(email_obj).start()
         return Response(
             {"detail": "check your email to reset your password"},
             status=status.HTTP_200_OK,
@@ -192,8 +192,10 @@ class ProfileApiView(generics.RetrieveUpdateAPIView):
     queryset = Profile.objects.all()
 
     def get_object(self):
-        queryset = self.get_queryset()
-        obj = get_object_or_404(queryset, user=self.request.user)
+        # request.profile comes from the cache with its user
+        obj = self.request.profile
+        if not obj:
+            raise Http404
         return obj
 
 
@@ -235,13 +237,12 @@ class ActivationResendApiView(generics.GenericAPIView):
         serializer.is_valid(raise_exception=True)
         user_obj = serializer.validated_data["user"]
         token = self.get_token_for_user(user_obj)
-        email_obj = EmailMessage(
+        queue_email(
             "email/activation.tpl",
             {"token": token},
             "farimahtizghadam@gmail.com",
-            to=[user_obj.email],
+            [user_obj.email],
         )
-        EmailThread(email_obj).start()
         return Response(
             {"detail": "your activation resend successfully"}, status=status.HTTP_200_OK
         )
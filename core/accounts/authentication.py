@@ -0,0 +1,45 @@
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .models import User, AUTH_CACHE_TIMEOUT, token_cache_key
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend reading the user of a session from the cache, which saves
+    AuthenticationMiddleware its query on every request
+    """
+
+    def get_user(self, user_id):
+        user = User.objects.get_cached(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication with the token to user id lookup and the user in
+    the cache, a cached request runs no query. request.auth is an unsaved
+    Token with the same key and user, deleting it deletes the token.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        user_id = cache.get(cache_key)
+        if user_id is None:
+            # the token and its user in one query, both are cached
+            token = Token.objects.select_related("user").filter(key=key).first()
+            if token is None:
+                raise exceptions.AuthenticationFailed(_("Invalid token."))
+            user = token.user
+            cache.set(cache_key, user.pk, AUTH_CACHE_TIMEOUT)
+            User.objects.set_cached(user)
+        else:
+            user = User.objects.get_cached(user_id)
+
+        if user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+        return (user, Token(key=key, user=user))
@@ -0,0 +1,170 @@
+import logging
+import smtplib
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+from mail_templated import EmailMessage
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+# emails sent by a run of the send task, over one SMTP connection
+SEND_BATCH_SIZE = 50
+# runs of the send task per worker, SEND_BATCH_SIZE times as many emails
+SEND_RATE_LIMIT = "30/m"
+# one send task waiting in the queue at a time
+SEND_QUEUED_KEY = "accounts:outbox:queued"
+SEND_QUEUED_TIMEOUT = 60
+# a failed email is retried after RETRY_BACKOFF seconds, doubled at every
+# attempt, and given up after MAX_ATTEMPTS
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF = 60
+
+# emails claimed by a run are not due again before SEND_LEASE seconds, the
+# emails of a worker killed while sending go to another run after that
+SEND_LEASE = 5 * 60
+
+SEND_ERRORS = (smtplib.SMTPException, OSError)
+# the server refused one email, the others of the batch can still be sent.
+# Any other send error is the connection's, the batch is tried again.
+REJECT_ERRORS = (
+    smtplib.SMTPRecipientsRefused,
+    smtplib.SMTPSenderRefused,
+    smtplib.SMTPDataError,
+)
+
+
+def queue_email(template_name, context, from_email, to):
+    """
+    Render a mail_templated email into the outbox. It is written in the
+    current transaction and the send task is queued once it commits, so an
+    email is never lost nor sent for a change that was rolled back.
+    """
+    message = EmailMessage(template_name, context, from_email, to, render=True)
+    body = message.body
+    html = "".join(
+        content for content, mimetype in message.alternatives if mimetype == "text/html"
+    )
+    if message.content_subtype == "html":
+        body, html = "", body
+    email = OutboxEmail.objects.create(
+        subject=message.subject,
+        body=body,
+        html=html,
+        from_email=from_email,
+        to=list(to),
+    )
+    transaction.on_commit(schedule_send)
+    return email
+
+
+def queue_emails(messages):
+    """
+    Bulk queue_email of emails rendered by the caller, dicts of the
+    OutboxEmail fields, in one INSERT
+    """
+    emails = OutboxEmail.objects.bulk_create(
+        [OutboxEmail(**message) for message in messages], batch_size=500
+    )
+    transaction.on_commit(schedule_send)
+    return emails
+
+
+def schedule_send():
+    """
+    queue the send task unless one is already waiting
+    """
+    from .tasks import send_outbox
+
+    if not cache.add(SEND_QUEUED_KEY, True, SEND_QUEUED_TIMEOUT):
+        return
+    try:
+        send_outbox.delay()
+    except Exception as err:
+        # the email stays in the outbox, the periodic run sends it
+        logger.warning("could not queue the outbox send: %s", err)
+        cache.delete(SEND_QUEUED_KEY)
+
+
+def build_message(email, connection):
+    message = EmailMultiAlternatives(
+        email.subject,
+        email.body or email.html,
+        email.from_email,
+        email.to,
+        connection=connection,
+    )
+    if not email.body:
+        message.content_subtype = "html"
+    elif email.html:
+        message.attach_alternative(email.html, "text/html")
+    return message
+
+
+def send_batch(batch_size=SEND_BATCH_SIZE):
+    """
+    Send up to batch_size due emails of the outbox over one SMTP connection.
+    The emails are claimed in a short transaction, no lock is held while
+    they are sent, and marked once the batch is over, a worker killed in
+    between sends the batch again once the lease is over. An email the
+    server rejects is retried later. A connection error raises, the emails
+    not sent yet are due again at once and their attempt is not counted.
+    """
+    emails = claim(batch_size)
+    if not emails:
+        return {"sent": 0, "failed": 0, "more": False}
+
+    sent = failed = 0
+    try:
+        with get_connection(fail_silently=False) as connection:
+            for email in emails:
+                try:
+                    connection.send_messages([build_message(email, connection)])
+                except REJECT_ERRORS as err:
+                    failed += 1
+                    retry_later(email, err)
+                else:
+                    sent += 1
+                    email.status = OutboxEmail.SENT
+                    email.sent_date = timezone.now()
+    finally:
+        # the emails not tried still hold their next_attempt from before
+        # the claim, saving it back ends their lease
+        OutboxEmail.objects.bulk_update(
+            emails, ["status", "attempts", "next_attempt", "last_error", "sent_date"]
+        )
+    return {"sent": sent, "failed": failed, "more": len(emails) == batch_size}
+
+
+def claim(batch_size):
+    """
+    Due emails leased to this run for SEND_LEASE seconds, the rows are
+    locked with skip_locked only while they are claimed so concurrent runs
+    claim different emails
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxEmail.PENDING, next_attempt__lte=now)
+            .order_by("next_attempt", "id")[:batch_size]
+        )
+        OutboxEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+            next_attempt=now + timedelta(seconds=SEND_LEASE)
+        )
+    return emails
+
+
+def retry_later(email, err):
+    email.attempts += 1
+    email.last_error = str(err)
+    if email.attempts >= MAX_ATTEMPTS:
+        logger.error("giving up on outbox email %s: %s", email.pk, err)
+        email.status = OutboxEmail.FAILED
+    else:
+        delay = RETRY_BACKOFF * 2 ** (email.attempts - 1)
+        email.next_attempt = timezone.now() + timedelta(seconds=delay)
@@ -0,0 +1,35 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import SimpleLazyObject
+
+from .models import Profile
+
+
+def get_profile(request):
+    if not hasattr(request, "_cached_profile"):
+        user = request.user
+        request._cached_profile = (
+            Profile.objects.get_cached(user.pk) if user.is_authenticated else None
+        )
+    return request._cached_profile
+
+
+class ProfileMiddleware:
+    """
+    Set request.profile, the profile of the authenticated user, resolved on
+    first use at most once per request. DRF stores the user it authenticates
+    on the wrapped request too, so token and jwt requests get their profile
+    as long as it is read inside the view. It is falsy for anonymous users.
+    Async views must not read it, resolving it queries the database.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.profile = SimpleLazyObject(lambda: get_profile(request))
+        return self.get_response(request)
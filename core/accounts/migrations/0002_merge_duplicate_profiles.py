@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:01
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_profiles(apps, schema_editor):
+    """
+    Keep the oldest profile of every user, the tasks of the other profiles
+    are moved to it before they are deleted
+    """
+    Profile = apps.get_model("accounts", "Profile")
+    Task = apps.get_model("todo", "Task")
+    duplicated = (
+        Profile.objects.values("user_id")
+        .annotate(profiles=Count("id"), keep=Min("id"))
+        .filter(profiles__gt=1)
+    )
+    for row in duplicated.iterator():
+        others = Profile.objects.filter(user_id=row["user_id"]).exclude(id=row["keep"])
+        Task.objects.filter(user__in=others).update(user_id=row["keep"])
+        others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0001_initial"),
+        ("todo", "0004_task_search_vector"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_profiles, migrations.RunPython.noop),
+    ]
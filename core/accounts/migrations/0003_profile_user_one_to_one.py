@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    """
+    in its own migration, postgres refuses to alter a table with pending
+    deferred constraint checks from the merge in the same transaction
+    """
+
+    dependencies = [
+        ("accounts", "0002_merge_duplicate_profiles"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="profile",
+            name="user",
+            field=models.OneToOneField(
+                on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL
+            ),
+        ),
+    ]
@@ -1,2 +1,3 @@
 from .users import *
 from .profiles import *
+from .emails import *
@@ -1,7 +1,35 @@
+from django.core.cache import cache
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .users import User
+from .users import User, delete_on_commit
+
+# request.profile is served from the cache for at most PROFILE_TIMEOUT
+# seconds, saving the profile or its user drops the entry
+PROFILE_KEY = "accounts:profile:{user_id}"
+PROFILE_TIMEOUT = 60
+
+
+class ProfileManager(models.Manager):
+
+    def get_cached(self, user_id):
+        """
+        Profile of a user, with the user, through the cache
+        """
+        key = PROFILE_KEY.format(user_id=user_id)
+        profile = cache.get(key)
+        if profile is None:
+            profile = self.select_related("user").filter(user_id=user_id).first()
+            if profile is not None:
+                cache.set(key, profile, PROFILE_TIMEOUT)
+        return profile
+
+    def invalidate(self, user_id):
+        """
+        Drop the cached profile of a user, again on commit inside a
+        transaction so a concurrent request can not cache the old row back
+        """
+        delete_on_commit(PROFILE_KEY.format(user_id=user_id))
 
 
 class Profile(models.Model):
@@ -9,7 +37,7 @@ class Profile(models.Model):
     Profile model for users extra data
     """
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    user = models.OneToOneField(User, on_delete=models.CASCADE)
     first_name = models.CharField(max_length=255)
     last_name = models.CharField(max_length=255)
     image = models.ImageField(null=True, blank=True)
@@ -17,6 +45,8 @@ class Profile(models.Model):
     creation_date = models.DateTimeField(auto_now_add=True)
     updated_date = models.DateTimeField(auto_now=True)
 
+    objects = ProfileManager()
+
     def __str__(self):
         return self.user.email
 
@@ -28,3 +58,11 @@ def save_profile(sender, instance, created, **kwargs):
     """
     if created:
         Profile.objects.create(user=instance)
+    else:
+        # the cached profile carries its user
+        Profile.objects.invalidate(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Profile)
+def invalidate_profile(sender, instance, **kwargs):
+    Profile.objects.invalidate(instance.user_id)
@@ -1,4 +1,9 @@
-from django.db import models
+import hashlib
+
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import (
     AbstractBaseUser,
     PermissionsMixin,
@@ -6,6 +11,13 @@ from django.contrib.auth.models import (
 )
 from django.utils.translation import gettext_lazy as _
 
+# the user of a session or of an api token is read from the cache for at
+# most AUTH_CACHE_TIMEOUT seconds, see accounts.authentication. Saving or
+# deleting the user drops its entry, deleting a token drops the token's.
+USER_KEY = "accounts:user:{user_id}"
+TOKEN_KEY = "accounts:token:{digest}"
+AUTH_CACHE_TIMEOUT = 60
+
 
 class UserManager(BaseUserManager):
     """
@@ -39,6 +51,32 @@ class UserManager(BaseUserManager):
             raise ValueError(_("Superuser must have is_superuser=True."))
         return self.create_user(email, password, **extra_fields)
 
+    def get_cached(self, user_id):
+        """
+        User by primary key through the cache, None when it does not exist
+        """
+        key = USER_KEY.format(user_id=user_id)
+        user = cache.get(key)
+        if user is None:
+            user = self.filter(pk=user_id).first()
+            if user is not None:
+                self.set_cached(user)
+        return user
+
+    def set_cached(self, user):
+        """
+        Cache a user read by another query for get_cached()
+        """
+        cache.set(USER_KEY.format(user_id=user.pk), user, AUTH_CACHE_TIMEOUT)
+
+    def invalidate(self, user_id):
+        """
+        Drop the cached user, again on commit inside a transaction so a
+        concurrent request can not cache the old row back
+        """
+        key = USER_KEY.format(user_id=user_id)
+        delete_on_commit(key)
+
 
 class User(AbstractBaseUser, PermissionsMixin):
     """
@@ -61,3 +99,28 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     def __str__(self):
         return self.email
+
+
+def token_cache_key(token_key):
+    # the token itself is a credential, it is not stored in a cache key
+    return TOKEN_KEY.format(digest=hashlib.sha256(token_key.encode()).hexdigest())
+
+
+def delete_on_commit(key):
+    cache.delete(key)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.delete(key))
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user(sender, instance, **kwargs):
+    """
+    a password, is_active or is_verified change reaches the authentication
+    at once
+    """
+    User.objects.invalidate(instance.pk)
+
+
+@receiver(post_delete, sender="authtoken.Token")
+def invalidate_token(sender, instance, **kwargs):
+    delete_on_commit(token_cache_key(instance.key))
@@ -0,0 +1,26 @@
+import logging
+
+from celery import shared_task
+from django.core.cache import cache
+
+from accounts import emails
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, rate_limit=emails.SEND_RATE_LIMIT, max_retries=5)
+def send_outbox(self):
+    """
+    Send a batch of the outbox and queue the next one while the outbox is
+    not drained. Also run periodically by celery beat, for the emails whose
+    task could not be queued or whose retry is due.
+    """
+    cache.delete(emails.SEND_QUEUED_KEY)
+    try:
+        stats = emails.send_batch()
+    except emails.SEND_ERRORS as err:
+        logger.warning("could not reach the SMTP server: %s", err)
+        raise self.retry(exc=err, countdown=emails.RETRY_BACKOFF)
+    if stats["more"]:
+        emails.schedule_send()
+    return stats
@@ -1,4 +1,6 @@
 import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
 from django.urls import reverse
 from rest_framework.test import APIClient
 from accounts.models import User
@@ -79,6 +81,24 @@ class TestUserApi:
         response = api_client.post(url, data)
         assert response.status_code == 400
 
+    def test_async_registration_201_status_code(self, common_user):
+        url = reverse("accounts:api-V1:async-registration")
+        data = {
+            "email": "newuser@test.com",
+            "password": "@/1234567",
+            "password_confirm": "@/1234567",
+        }
+        response = async_to_sync(AsyncClient().post)(
+            url, data, content_type="application/json"
+        )
+        assert response.status_code == 201
+        assert User.objects.filter(email="newuser@test.com").exists()
+        response = async_to_sync(AsyncClient().post)(
+            url, data, content_type="application/json"
+        )
+        assert response.status_code == 400
+        assert "email" in response.json()
+
     def test_login_success_200_status_code(self, api_client, common_user):
         url = reverse("accounts:api-V1:token-login")
         data = {"email": "testuser@test.com", "password": "@/$1234567"}
@@ -0,0 +1,104 @@
+import pytest
+from django.contrib.auth import authenticate
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from accounts.authentication import CachedModelBackend, CachedTokenAuthentication
+from accounts.models import User, USER_KEY
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def user():
+    return User.objects.create_user(
+        email="admin@admin.com", password="@/1234567", is_verified=True
+    )
+
+
+@pytest.fixture
+def token_client(user):
+    token = Token.objects.create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+    return client
+
+
+@pytest.mark.django_db
+class TestCachedAuthentication:
+
+    def test_cached_token_request_runs_no_query(
+        self, token_client, django_assert_num_queries
+    ):
+        url = reverse("accounts:api-V1:profile")
+        assert token_client.get(url).status_code == 200
+        with django_assert_num_queries(0):
+            assert token_client.get(url).status_code == 200
+
+    def test_token_miss_runs_one_query_and_caches_the_user(
+        self, user, django_assert_num_queries
+    ):
+        token = Token.objects.create(user=user)
+        authentication = CachedTokenAuthentication()
+        with django_assert_num_queries(1):
+            assert authentication.authenticate_credentials(token.key)[0] == user
+        assert cache.get(USER_KEY.format(user_id=user.pk)) == user
+        with django_assert_num_queries(0):
+            assert authentication.authenticate_credentials(token.key)[0] == user
+
+    def test_discarded_token_is_rejected(self, token_client):
+        url = reverse("accounts:api-V1:profile")
+        assert token_client.get(url).status_code == 200
+        response = token_client.post(reverse("accounts:api-V1:token-logout"))
+        assert response.status_code == 204
+        assert token_client.get(url).status_code == 401
+
+    def test_deactivated_user_is_rejected(self, user, token_client):
+        url = reverse("accounts:api-V1:profile")
+        assert token_client.get(url).status_code == 200
+        user.is_active = False
+        user.save()
+        assert token_client.get(url).status_code == 401
+
+    def test_password_change_drops_the_cached_user(self, user, token_client):
+        url = reverse("accounts:api-V1:profile")
+        token_client.get(url)
+        assert cache.get(USER_KEY.format(user_id=user.pk)) is not None
+        response = token_client.put(
+            reverse("accounts:api-V1:change-password"),
+            {
+                "old_password": "@/1234567",
+                "new_password": "@/7654321a",
+                "new_password_confirm": "@/7654321a",
+            },
+        )
+        assert response.status_code == 200
+        assert cache.get(USER_KEY.format(user_id=user.pk)) is None
+
+    def test_session_user_comes_from_the_cache(self, user, django_assert_num_queries):
+        backend = CachedModelBackend()
+        assert backend.get_user(user.pk) == user
+        with django_assert_num_queries(0):
+            assert backend.get_user(user.pk) == user
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        User.objects.invalidate(user.pk)
+        assert backend.get_user(user.pk) is None
+
+    def test_failed_login_checks_the_password_once(self, user, monkeypatch):
+        checks = []
+        check_password = User.check_password
+
+        def counted(self, raw_password):
+            checks.append(raw_password)
+            return check_password(self, raw_password)
+
+        monkeypatch.setattr(User, "check_password", counted)
+        assert authenticate(email=user.email, password="wrong") is None
+        assert checks == ["wrong"]
@@ -0,0 +1,137 @@
+import smtplib
+
+import pytest
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts import emails
+from accounts.emails import queue_email, send_batch
+from accounts.models import OutboxEmail
+from accounts.tasks import send_outbox
+
+
+class RejectingBackend(EmailBackend):
+    """
+    locmem backend refusing the emails to rejected@test.com
+    """
+
+    def send_messages(self, messages):
+        for message in messages:
+            if "rejected@test.com" in message.to:
+                raise smtplib.SMTPRecipientsRefused({"rejected@test.com": (550, "")})
+        return super().send_messages(messages)
+
+
+class DisconnectingBackend(EmailBackend):
+    """
+    locmem backend losing the connection at the second email, the emails
+    of the batch are leased while it sends
+    """
+
+    def send_messages(self, messages):
+        assert not OutboxEmail.objects.filter(next_attempt__lte=timezone.now())
+        if len(mail.outbox) == 1:
+            raise smtplib.SMTPServerDisconnected("connection lost")
+        return super().send_messages(messages)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def queue(to):
+    return queue_email("email/activation.tpl", {"token": "abc"}, "from@test.com", [to])
+
+
+@pytest.mark.django_db
+class TestOutbox:
+
+    def test_registration_email_is_sent_from_the_outbox(
+        self, django_capture_on_commit_callbacks, monkeypatch
+    ):
+        # the send task runs inline instead of being queued
+        monkeypatch.setattr(send_outbox, "delay", lambda: send_outbox())
+        url = reverse("accounts:api-V1:registration")
+        data = {
+            "email": "newuser@test.com",
+            "password": "@/1234567",
+            "password_confirm": "@/1234567",
+        }
+        with django_capture_on_commit_callbacks(execute=True):
+            response = APIClient().post(url, data)
+        assert response.status_code == 201
+        assert len(mail.outbox) == 1
+        assert mail.outbox[0].to == ["newuser@test.com"]
+        assert "activation/confirm/" in mail.outbox[0].body
+        assert OutboxEmail.objects.get().status == OutboxEmail.SENT
+
+    def test_rolled_back_email_is_never_sent(self):
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                queue("user@test.com")
+                raise RuntimeError
+        assert not OutboxEmail.objects.exists()
+
+    def test_batches_share_one_connection(self, monkeypatch):
+        opened = []
+        monkeypatch.setattr(
+            EmailBackend, "open", lambda backend: opened.append(backend)
+        )
+        for i in range(3):
+            queue(f"user{i}@test.com")
+        assert send_batch(batch_size=2) == {"sent": 2, "failed": 0, "more": True}
+        assert send_batch(batch_size=2) == {"sent": 1, "failed": 0, "more": False}
+        assert len(opened) == 2
+        assert [message.to for message in mail.outbox] == [
+            ["user0@test.com"],
+            ["user1@test.com"],
+            ["user2@test.com"],
+        ]
+
+    def test_rejected_email_is_retried_then_given_up(self, settings):
+        settings.EMAIL_BACKEND = "accounts.tests.test_emails.RejectingBackend"
+        queue("rejected@test.com")
+        queue("user@test.com")
+        assert send_batch() == {"sent": 1, "failed": 1, "more": False}
+        rejected = OutboxEmail.objects.get(to=["rejected@test.com"])
+        assert rejected.status == OutboxEmail.PENDING
+        assert rejected.attempts == 1
+        # not due before its backoff
+        assert send_batch()["failed"] == 0
+
+        for _ in range(emails.MAX_ATTEMPTS - 1):
+            OutboxEmail.objects.filter(pk=rejected.pk).update(
+                next_attempt=rejected.creation_date
+            )
+            send_batch()
+        rejected.refresh_from_db()
+        assert rejected.status == OutboxEmail.FAILED
+        assert rejected.attempts == emails.MAX_ATTEMPTS
+
+    def test_lost_connection_retries_the_batch(self, settings):
+        settings.EMAIL_BACKEND = "accounts.tests.test_emails.DisconnectingBackend"
+        for i in range(3):
+            queue(f"user{i}@test.com")
+        with pytest.raises(smtplib.SMTPServerDisconnected):
+            send_batch()
+        first, *rest = OutboxEmail.objects.order_by("id")
+        assert first.status == OutboxEmail.SENT
+        for email in rest:
+            assert email.status == OutboxEmail.PENDING
+            assert email.attempts == 0
+            assert email.next_attempt <= timezone.now()
+
+    def test_one_send_task_is_queued_at_a_time(self, monkeypatch):
+        queued = []
+        monkeypatch.setattr(send_outbox, "delay", lambda: queued.append(True))
+        emails.schedule_send()
+        emails.schedule_send()
+        assert len(queued) == 1
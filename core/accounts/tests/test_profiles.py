@@ -0,0 +1,66 @@
+import pytest
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import User, Profile
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def common_user():
+    return User.objects.create_user(
+        email="testuser@test.com", password="@/$1234567", is_verified=True
+    )
+
+
+@pytest.fixture
+def authenticated_client(common_user):
+    client = APIClient()
+    client.force_authenticate(user=common_user)
+    return client
+
+
+@pytest.mark.django_db
+class TestProfile:
+
+    def test_one_profile_per_user(self, common_user):
+        with pytest.raises(IntegrityError):
+            Profile.objects.create(user=common_user)
+
+    def test_profile_api_reads_the_cached_profile(
+        self, authenticated_client, common_user
+    ):
+        url = reverse("accounts:api-V1:profile")
+        response = authenticated_client.get(url)
+        assert response.status_code == 200
+        assert response.data["email"] == common_user.email
+        with CaptureQueriesContext(connection) as queries:
+            response = authenticated_client.get(url)
+        assert response.status_code == 200
+        assert not any("accounts_profile" in query["sql"] for query in queries)
+
+    def test_saving_the_profile_invalidates_the_cache(
+        self, authenticated_client, common_user
+    ):
+        url = reverse("accounts:api-V1:profile")
+        authenticated_client.get(url)
+        response = authenticated_client.patch(url, {"first_name": "changed"})
+        assert response.status_code == 200
+        assert Profile.objects.get_cached(common_user.pk).first_name == "changed"
+
+        common_user.email = "renamed@test.com"
+        common_user.save()
+        assert authenticated_client.get(url).data["email"] == "renamed@test.com"
+
+    def test_profile_api_requires_authentication(self):
+        response = APIClient().get(reverse("accounts:api-V1:profile"))
+        assert response.status_code == 401
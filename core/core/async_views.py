@@ -0,0 +1,54 @@
+import json
+
+from django.http import Http404, JsonResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException, NotFound, ParseError
+
+
+class AsyncApiView(View):
+    """
+    Base of the async json endpoints, served without holding a thread while
+    they wait when the project runs under ASGI (see core.asgi). They take
+    json or form bodies, answer json and report errors the way DRF does,
+    raising an APIException gives the same status and body. Like DRF views
+    they are csrf exempt, they do not authenticate, only public endpoints
+    get an async variant.
+    """
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except Http404:
+            return self.handle_exception(NotFound())
+        except APIException as exc:
+            return self.handle_exception(exc)
+
+    def handle_exception(self, exc):
+        if isinstance(exc.detail, (list, dict)):
+            data = exc.detail
+        else:
+            data = {"detail": exc.detail}
+        return JsonResponse(data, status=exc.status_code, safe=False)
+
+    def get_data(self, request):
+        if request.content_type == "application/json":
+            try:
+                return json.loads(request.body or b"{}")
+            except ValueError as exc:
+                raise ParseError(f"JSON parse error - {exc}")
+        return request.POST
+
+    def validate(self, serializer_class, data):
+        """
+        validated data of a serializer that does not query the database,
+        the others must be validated through sync_to_async
+        """
+        serializer = serializer_class(data=data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
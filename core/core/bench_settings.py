@@ -0,0 +1,32 @@
+"""
+Settings of the endpoint benchmarks, see `manage.py bench_endpoints`.
+
+SQLite is used by default, run with BENCH_DB=postgres to benchmark against
+the postgres of the DB_* environment variables instead. The cache is local
+memory and emails never leave the process.
+"""
+
+import os
+
+from .settings import *  # noqa
+from .settings import BASE_DIR
+
+DEBUG = False
+
+if os.environ.get("BENCH_DB", "sqlite") == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "bench.sqlite3",
+        }
+    }
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+
+CELERY_TASK_ALWAYS_EAGER = True
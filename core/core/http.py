@@ -0,0 +1,149 @@
+import logging
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# (connect, read) seconds
+DEFAULT_TIMEOUT = (3.05, 10)
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.3
+DEFAULT_POOL_SIZE = 10
+
+
+class CircuitOpen(requests.exceptions.RequestException):
+    """
+    the upstream is failing, the call was not even tried
+    """
+
+
+class CircuitBreaker:
+    """
+    Per process breaker over the calls of the last `window` seconds. It
+    opens when at least `min_calls` were made and `failure_ratio` of them
+    failed, then fails every call for `open_timeout` seconds. After that a
+    single probe call is let through, its outcome closes or reopens it.
+    """
+
+    def __init__(self, failure_ratio=0.5, min_calls=10, window=60, open_timeout=30):
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.window = window
+        self.open_timeout = open_timeout
+        self.calls = deque()
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.open_timeout:
+            return "open"
+        return "half-open"
+
+    def allow(self):
+        """
+        None when the call must not be tried, otherwise how it was admitted,
+        "closed" or "probe", to pass back to record() with its outcome
+        """
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return "closed"
+            if state == "half-open" and not self.probing:
+                self.probing = True
+                return "probe"
+            return None
+
+    def record(self, success, admitted="closed"):
+        now = time.monotonic()
+        with self.lock:
+            if admitted == "probe":
+                self.probing = False
+                if success:
+                    self.opened_at = None
+                    self.calls.clear()
+                else:
+                    self.opened_at = now
+                return
+            if self.opened_at is not None:
+                # a slow call admitted before the breaker opened, its
+                # outcome says nothing about the upstream now
+                return
+            self.calls.append((now, success))
+            while self.calls and self.calls[0][0] < now - self.window:
+                self.calls.popleft()
+            total = len(self.calls)
+            failures = sum(1 for _, ok in self.calls if not ok)
+            if total >= self.min_calls and failures >= self.failure_ratio * total:
+                logger.warning("circuit opened after %d failed calls", failures)
+                self.opened_at = now
+
+
+class HttpClient:
+    """
+    Outbound HTTP client shared by a process: one session with a pool of
+    keep-alive connections, connect and read timeouts on every call,
+    bounded retries with exponential backoff on connection errors and 502,
+    503, 504 answers of GET and HEAD calls, and a circuit breaker.
+    Server errors and network failures count against the breaker, 4xx
+    answers are the caller's fault and do not.
+    """
+
+    def __init__(
+        self,
+        timeout=DEFAULT_TIMEOUT,
+        retries=DEFAULT_RETRIES,
+        backoff=DEFAULT_BACKOFF,
+        pool_size=DEFAULT_POOL_SIZE,
+        breaker=None,
+    ):
+        self.timeout = timeout
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        retry = Retry(
+            total=retries,
+            # a read timeout is not retried, a slow upstream would hold the
+            # caller for (retries + 1) read timeouts
+            read=False,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=("GET", "HEAD"),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        admitted = self.breaker.allow()
+        if admitted is None:
+            raise CircuitOpen(f"circuit open, {method} {url} not tried")
+        kwargs.setdefault("timeout", self.timeout)
+        try:
+            response = self.session.request(method, url, **kwargs)
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as err:
+            self.breaker.record(err.response.status_code < 500, admitted)
+            raise
+        except requests.exceptions.RequestException:
+            self.breaker.record(False, admitted)
+            raise
+        except BaseException:
+            # whatever else was raised, a probe still frees the half-open slot
+            self.breaker.record(False, admitted)
+            raise
+        self.breaker.record(True, admitted)
+        return response
@@ -0,0 +1,160 @@
+import logging
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("core.queries")
+
+# IN lists and multi row VALUES change with the number of parameters, they
+# are folded so the statements still group together
+IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+VALUES_LIST = re.compile(r"VALUES (?:\([^()]*\), )*\([^()]*\)")
+SPACES = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(limit):
+    """
+    Set the maximum number of queries of a function view, class based views
+    set a query_budget attribute instead
+    """
+
+    def decorator(view):
+        view.query_budget = limit
+        return view
+
+    return decorator
+
+
+def normalize(sql):
+    sql = SPACES.sub(" ", sql)
+    sql = IN_LIST.sub("IN (...)", sql)
+    return VALUES_LIST.sub("VALUES (...)", sql)
+
+
+def call_site():
+    """
+    file:line of the innermost frame of the project's own code
+    """
+    frame = sys._getframe(2)
+    base_dir = str(settings.BASE_DIR)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        own_code = filename.startswith(base_dir) and "site-packages" not in filename
+        if own_code and filename != __file__:
+            return f"{os.path.relpath(filename, base_dir)}:{frame.f_lineno}"
+        frame = frame.f_back
+    return None
+
+
+class QueryRecorder:
+    """
+    execute_wrapper that counts the statements of a request by shape
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.statements = Counter()
+        self.sites = defaultdict(Counter)
+
+    def __call__(self, execute, sql, params, many, context):
+        statement = normalize(sql)
+        self.total += 1
+        self.statements[statement] += 1
+        self.sites[statement][call_site()] += 1
+        return execute(sql, params, many, context)
+
+    def repeated(self, threshold):
+        return [
+            {
+                "sql": statement,
+                "count": count,
+                "call_site": self.sites[statement].most_common(1)[0][0],
+            }
+            for statement, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+
+class QueryInspectorMiddleware:
+    """
+    Opt-in (settings.QUERY_INSPECTOR) count of the SQL statements of every
+    request. Statements that run QUERY_REPEAT_THRESHOLD times or more with
+    only their parameters changing are logged as probable N+1 queries, with
+    the line of project code that ran them. A view may declare a
+    query_budget, QUERY_BUDGET is the default of the others; going over it
+    is logged, or raises QueryBudgetExceeded when QUERY_BUDGET_RAISE is set,
+    which is how the tests assert budgets. Under ASGI the requests are not
+    inspected, their queries run in sync_to_async threads the recorder is
+    not installed on.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async or not settings.QUERY_INSPECTOR:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        budget = getattr(request, "query_budget", settings.QUERY_BUDGET)
+        repeated = recorder.repeated(settings.QUERY_REPEAT_THRESHOLD)
+        response["X-Query-Count"] = str(recorder.total)
+        response.query_report = {
+            "view": getattr(request, "query_view", None),
+            "total": recorder.total,
+            "budget": budget,
+            "repeated": repeated,
+        }
+
+        for item in repeated:
+            logger.warning(
+                "possible N+1 in %s %s: %d x %s at %s",
+                request.method,
+                request.path,
+                item["count"],
+                item["sql"],
+                item["call_site"],
+            )
+        if budget is not None and recorder.total > budget:
+            message = (
+                f"{request.method} {request.path} ran {recorder.total} queries, "
+                f"the budget of {response.query_report['view']} is {budget}"
+            )
+            if settings.QUERY_BUDGET_RAISE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.QUERY_INSPECTOR:
+            return None
+        # as_view() keeps the class on view_class, DRF viewsets on cls
+        view = getattr(view_func, "view_class", None) or getattr(
+            view_func, "cls", view_func
+        )
+        request.query_view = f"{view.__module__}.{view.__qualname__}"
+        budget = getattr(view, "query_budget", None)
+        if budget is not None:
+            request.query_budget = budget
+        return None
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "accounts.apps.AccountsConfig",
     "todo.apps.TodoConfig",
     "rest_framework",
@@ -54,15 +55,23 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.QueryInspectorMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "accounts.middleware.ProfileMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# opt-in query count and N+1 detection, see core.middleware
+QUERY_INSPECTOR = config("QUERY_INSPECTOR", cast=bool, default=False)
+# default query budget of the views without a query_budget, None is unlimited
+QUERY_BUDGET = None
+QUERY_BUDGET_RAISE = config("QUERY_BUDGET_RAISE", cast=bool, default=False)
+QUERY_REPEAT_THRESHOLD = 5
 
 ROOT_URLCONF = "core.urls"
 
@@ -151,12 +160,18 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # user manager config
 AUTH_USER_MODEL = "accounts.User"
 
+# the user of a session is read from the cache. A single backend, a failed
+# login checks the password once.
+AUTHENTICATION_BACKENDS = [
+    "accounts.authentication.CachedModelBackend",
+]
+
 # rest framework settings & permissions
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.BasicAuthentication",
         "rest_framework.authentication.SessionAuthentication",
-        "rest_framework.authentication.TokenAuthentication",
+        "accounts.authentication.CachedTokenAuthentication",
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ],
 }
@@ -172,8 +187,27 @@ EMAIL_HOST_PASSWORD = ""  # SMTP server password
 EMAIL_USE_SSL = False  # Set to True if using SSL
 
 
+# openweathermap.org key of the weather api
+OPENWEATHER_API_KEY = config("OPENWEATHER_API_KEY", default="Your api_key")
+
+
 # celery config
 CELERY_BROKER_URL = "redis://redis:6379/1"
+CELERY_BEAT_SCHEDULE = {
+    "prewarm-weather": {
+        "task": "todo.tasks.prewarm_weather",
+        # keep in step with todo.weather.PREWARM_INTERVAL
+        "schedule": 60 * 10,
+    },
+    "send-outbox": {
+        "task": "accounts.tasks.send_outbox",
+        "schedule": 60,
+    },
+    "daily-digest": {
+        "task": "todo.tasks.send_daily_digest",
+        "schedule": 60 * 60 * 24,
+    },
+}
 
 
 # caching configs
@@ -5,6 +5,8 @@ from .models import Task
 class TaskAdmin(admin.ModelAdmin):
     empty_value_display = "unknown"
     list_display = ["title", "user", "complete", "creation_date"]
+    # the user column prints the profile, which prints its user's email
+    list_select_related = ["user__user"]
     list_filter = ("complete", "user")
     search_fields = ["title"]
     pass
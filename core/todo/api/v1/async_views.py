@@ -0,0 +1,131 @@
+from math import ceil
+
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from rest_framework import serializers, status
+from django_filters.utils import translate_validation
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from core.async_views import AsyncApiView
+from todo.models import Task
+from todo.weather import aget_weather, WeatherError
+from .conditional import set_validators, task_etag
+from .filters import TaskFilter, TaskSearchFilter
+from .paginations import DefaultPagination
+from .serializers import LocationSerializer, TaskValuesSerializer
+
+
+class AsyncTaskListView(AsyncApiView):
+    """
+    async variant of the task list of TaskModelViewSet, the same pages as
+    DefaultPagination with the TaskFilter filters, ?search= and ?ordering=,
+    read with the async ORM. Cursor pagination is not supported. It is not
+    cached, the rows are read straight from the database.
+    """
+
+    page_size = DefaultPagination.page_size
+    page_query_param = "page"
+    search_fields = ["title", "complete"]
+    ordering_fields = ("creation_date", "-creation_date")
+
+    async def get(self, request):
+        queryset = self.filter_queryset(request).values_list(
+            *TaskValuesSerializer.values_fields, named=True
+        )
+        ordering = request.GET.get("ordering")
+        if ordering in self.ordering_fields:
+            queryset = queryset.order_by(ordering, "id")
+
+        count = await queryset.acount()
+        total_pages = max(1, ceil(count / self.page_size))
+        try:
+            number = int(request.GET.get(self.page_query_param, 1))
+        except ValueError:
+            raise NotFound("Invalid page.")
+        if not 1 <= number <= total_pages:
+            raise NotFound("Invalid page.")
+
+        start = (number - 1) * self.page_size
+        end = start + self.page_size
+        rows = [row async for row in queryset[start:end]]
+        serializer = TaskValuesSerializer(rows, many=True, context={"request": request})
+        return JsonResponse(
+            {
+                "links": {
+                    "next": self.get_page_link(request, number + 1, total_pages),
+                    "previous": self.get_page_link(request, number - 1, total_pages),
+                },
+                "total_objects": count,
+                "total_pages": total_pages,
+                "results": serializer.data,
+            }
+        )
+
+    def filter_queryset(self, request):
+        """
+        the filters of TaskModelViewSet, they only build the query, it is
+        not run before the page is read
+        """
+        filterset = TaskFilter(request.GET, queryset=Task.objects.all())
+        if not filterset.is_valid():
+            raise translate_validation(filterset.errors)
+        return TaskSearchFilter().filter_queryset(Request(request), filterset.qs, self)
+
+    def get_page_link(self, request, number, total_pages):
+        if not 1 <= number <= total_pages:
+            return None
+        url = request.build_absolute_uri()
+        if number == 1:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, number)
+
+
+class AsyncTaskDetailView(AsyncApiView):
+    """
+    async variant of the task detail, with the same ETag and Last-Modified
+    validators
+    """
+
+    fields = ("id", "user_id", "title", "complete", "creation_date", "updated_date")
+
+    async def get(self, request, pk):
+        try:
+            task = await Task.objects.only(*self.fields).aget(pk=pk)
+        except Task.DoesNotExist:
+            raise NotFound()
+        etag = task_etag(task)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(task.updated_date.timestamp())
+        )
+        if response is None:
+            response = JsonResponse(
+                {
+                    "id": task.id,
+                    "user": task.user_id,
+                    "title": task.title,
+                    "complete": task.complete,
+                    "creation_date": serializers.DateTimeField().to_representation(
+                        task.creation_date
+                    ),
+                }
+            )
+        return set_validators(response, etag, task.updated_date)
+
+
+class AsyncWeatherApiView(AsyncApiView):
+    """
+    async variant of WeatherApiView, the event loop is free while the
+    weather is fetched
+    """
+
+    async def post(self, request):
+        data = self.validate(LocationSerializer, self.get_data(request))
+        try:
+            weather = await aget_weather(data["city"])
+        except WeatherError as err:
+            return JsonResponse(
+                {"error": str(err)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        return JsonResponse(weather)
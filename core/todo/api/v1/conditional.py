@@ -0,0 +1,51 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def task_etag(task):
+    """
+    strong etag of a single task, it changes with every save of the task
+    """
+    key = f"{task.pk}:{task.updated_date.isoformat()}"
+    return quote_etag(hashlib.sha1(key.encode()).hexdigest())
+
+
+def list_etag(tasks, meta):
+    """
+    strong etag of a list page, built from the ids and updated dates of its
+    tasks and the pagination data around them (links, counts)
+    """
+    digest = hashlib.sha1(repr(sorted(meta.items())).encode())
+    for task in tasks:
+        digest.update(f"{task.id}:{task.updated_date.isoformat()};".encode())
+    return quote_etag(digest.hexdigest())
+
+
+def conditional_response(request, etag, last_modified):
+    """
+    Evaluate the If-* headers of the request, return a 304 or 412 response
+    when one of them applies and None when the request should be served
+    """
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified.timestamp())
+    )
+    if response is not None and response.status_code == 412:
+        return precondition_failed()
+    return response
+
+
+def precondition_failed():
+    return Response(
+        {"detail": "the task has been modified by another request"},
+        status=status.HTTP_412_PRECONDITION_FAILED,
+    )
+
+
+def set_validators(response, etag, last_modified):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
@@ -0,0 +1,61 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+EXPORT_FIELDS = ("id", "title", "complete", "creation_date", "updated_date")
+# rows fetched per round trip of the server side cursor, also the number of
+# rows written per chunk of the streamed body
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """
+    file like object for csv.writer that hands back what is written
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset):
+    return (
+        queryset.order_by("id")
+        .values_list(*EXPORT_FIELDS)
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def chunked(lines):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == EXPORT_CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+def stream_csv(queryset):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    rows = export_rows(queryset)
+    yield from chunked(
+        writer.writerow((pk, title, complete, created.isoformat(), updated.isoformat()))
+        for pk, title, complete, created, updated in rows
+    )
+
+
+def stream_ndjson(queryset):
+    encoder = DjangoJSONEncoder()
+    rows = export_rows(queryset)
+    yield from chunked(
+        encoder.encode(dict(zip(EXPORT_FIELDS, row))) + "\n" for row in rows
+    )
+
+
+EXPORT_FORMATS = {
+    "ndjson": (stream_ndjson, "application/x-ndjson"),
+    "csv": (stream_csv, "text/csv"),
+}
@@ -1,5 +1,12 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection
+from django.db.models import F, Q
 from django_filters import rest_framework as filters
-from todo.models import Task
+from rest_framework.filters import SearchFilter
+from todo.models import Task, SEARCH_CONFIG
 
 
 class TaskFilter(filters.FilterSet):
@@ -13,3 +20,39 @@ class TaskFilter(filters.FilterSet):
     class Meta:
         model = Task
         fields = ["title", "updated_date", "from_date", "to_date"]
+
+
+class TaskSearchFilter(SearchFilter):
+    """
+    Search on task titles backed by the postgres indexes of todo_task.
+    Words are matched as prefixes against the stored tsvector (GIN index)
+    and the whole term against the title trigrams, so small typos still
+    match. Results are ordered by relevance unless an ordering is asked.
+    Other databases fall back to the default ILIKE search.
+    """
+
+    word_re = re.compile(r"\w+")
+
+    def filter_queryset(self, request, queryset, view):
+        if connection.vendor != "postgresql":
+            return super().filter_queryset(request, queryset, view)
+
+        text = " ".join(self.get_search_terms(request))
+        words = self.word_re.findall(text)
+        if not words:
+            return queryset
+
+        query = SearchQuery(
+            " & ".join(f"{word}:*" for word in words),
+            config=SEARCH_CONFIG,
+            search_type="raw",
+        )
+        similarity = TrigramWordSimilarity(text, "title")
+        relevance = SearchRank(F("search_vector"), query) + similarity
+        return (
+            queryset.filter(
+                Q(search_vector=query) | Q(title__trigram_word_similar=text)
+            )
+            .annotate(relevance=relevance)
+            .order_by("-relevance", "-id")
+        )
@@ -1,4 +1,12 @@
-from rest_framework.pagination import PageNumberPagination
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    PageNumberPagination,
+    CursorPagination,
+    Cursor,
+    _reverse_ordering,
+)
 from rest_framework.response import Response
 
 
@@ -17,3 +25,127 @@ class DefaultPagination(PageNumberPagination):
                 "results": data,
             }
         )
+
+
+class TaskCursorPagination(CursorPagination):
+    """
+    Keyset pagination on (creation_date, id).
+    Every page is a single indexed range scan, so page N costs the same as
+    page 1. The total count is only computed when the client asks for it.
+    """
+
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("-creation_date", "-id")
+    count_query_param = "count"
+
+    def get_ordering(self, request, queryset, view):
+        # the ordering filter only exposes creation_date, so we just take its
+        # direction and always use id as the tie breaker of the key
+        ordering = self.ordering
+        for backend in getattr(view, "filter_backends", []):
+            if hasattr(backend, "get_ordering"):
+                ordering = backend().get_ordering(request, queryset, view) or ordering
+                break
+        direction = "-" if ordering[0].startswith("-") else ""
+        return (direction + "creation_date", direction + "id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ("1", "true"):
+            self.count = queryset.count()
+
+        reverse = self.cursor is not None and self.cursor.reverse
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+
+        self.position = None
+        if self.cursor is not None and self.cursor.position is not None:
+            self.position = self.decode_position(self.cursor.position)
+            queryset = queryset.filter(self.get_keyset_filter(ordering, self.position))
+
+        # fetch one extra row to know if there is a page after this one
+        results = list(queryset[: self.page_size + 1])
+        self.page = results[: self.page_size]
+        has_more = len(results) > self.page_size
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = self.position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_keyset_filter(self, ordering, position):
+        """
+        rows after (creation_date, id) in the ordering. The OR alone can not
+        bound a scan of the (creation_date, id) index, the redundant
+        creation_date bound in front of it lets the database start the scan
+        at the position instead of filtering every row before it.
+        """
+        creation_date, pk = position
+        descending = ordering[0].startswith("-")
+        lookup = "lt" if descending else "gt"
+        bound = "lte" if descending else "gte"
+        after = Q(**{f"creation_date__{lookup}": creation_date}) | Q(
+            creation_date=creation_date, **{f"id__{lookup}": pk}
+        )
+        return Q(**{f"creation_date__{bound}": creation_date}) & after
+
+    def decode_position(self, position):
+        try:
+            creation_date, pk = position.rsplit("|", 1)
+            creation_date = parse_datetime(creation_date)
+            pk = int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if creation_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return creation_date, pk
+
+    def _get_position_from_instance(self, instance, ordering):
+        if isinstance(instance, dict):
+            return f"{instance['creation_date'].isoformat()}|{instance['id']}"
+        return f"{instance.creation_date.isoformat()}|{instance.id}"
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.page:
+            position = self._get_position_from_instance(self.page[-1], self.ordering)
+        else:
+            position = self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            position = self._get_position_from_instance(self.page[0], self.ordering)
+        else:
+            position = self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def get_paginated_response(self, data):
+        response = {
+            "links": {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+            },
+        }
+        if self.count is not None:
+            response["total_objects"] = self.count
+        response["results"] = data
+        return Response(response)
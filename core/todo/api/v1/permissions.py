@@ -13,8 +13,8 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
 
-        # Instance must have an attribute named `author`.
-        return obj.user.user == request.user
+        # owner_id is a column of the task, no related row is loaded
+        return obj.owner_id == request.user.id
 
     def filter_queryset(self, request, queryset, view):
         return queryset.objects.filter(user=request.user)
@@ -1,6 +1,6 @@
+from django.urls import reverse
 from rest_framework import serializers
 from todo.models import Task
-from accounts.models import Profile
 
 
 class TaskSerializer(serializers.ModelSerializer):
@@ -34,12 +34,105 @@ class TaskSerializer(serializers.ModelSerializer):
         return rep
 
     def create(self, validate_data):
-        validate_data["user"] = Profile.objects.get(
-            user__id=self.context.get("request").user.id
-        )
+        validate_data["user"] = self.context.get("request").profile
         return super().create(validate_data)
 
 
+class TaskValuesSerializer(serializers.BaseSerializer):
+    """
+    Read only fast path of TaskSerializer for list pages.
+    Rows are the named tuples of values_list(*values_fields), the urls are
+    built from templates resolved once per request and the output has the
+    same shape as TaskSerializer.
+    """
+
+    values_fields = (
+        "id",
+        "user_id",
+        "title",
+        "complete",
+        "creation_date",
+        "updated_date",
+    )
+    url_marker = 999
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.url_templates = None
+        self.creation_date_field = serializers.DateTimeField()
+
+    def get_url_templates(self):
+        if self.url_templates is None:
+            marker = str(self.url_marker)
+            request = self.context.get("request")
+            relative_url = reverse(
+                "task:api-v1:task-detail", kwargs={"pk": self.url_marker}
+            )
+            absolute_url = request.build_absolute_uri(marker)
+            self.url_templates = (
+                *relative_url.rsplit(marker, 1),
+                *absolute_url.rsplit(marker, 1),
+            )
+        return self.url_templates
+
+    def to_representation(self, row):
+        relative_head, relative_tail, absolute_head, absolute_tail = (
+            self.get_url_templates()
+        )
+        pk = str(row.id)
+        return {
+            "id": row.id,
+            "user": row.user_id,
+            "title": row.title,
+            "complete": row.complete,
+            "relative_url": relative_head + pk + relative_tail,
+            "absolute_url": absolute_head + pk + absolute_tail,
+            "creation_date": self.creation_date_field.to_representation(
+                row.creation_date
+            ),
+        }
+
+
+class TaskBulkItemSerializer(serializers.ModelSerializer):
+    """
+    One item of a bulk request, id is required for updates and refused
+    for creates
+    """
+
+    id = serializers.IntegerField(required=False)
+
+    class Meta:
+        model = Task
+        fields = ["id", "title", "complete"]
+
+
+class TaskBulkDeleteSerializer(serializers.Serializer):
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=1000
+    )
+
+
+class TaskMoveSerializer(serializers.Serializer):
+
+    before = serializers.IntegerField(required=False)
+    after = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if len(attrs) != 1:
+            raise serializers.ValidationError(
+                "exactly one of before or after must be given"
+            )
+        return super().validate(attrs)
+
+
 class LocationSerializer(serializers.Serializer):
 
     city = serializers.CharField(required=True)
+
+
+class LocationBatchSerializer(serializers.Serializer):
+
+    cities = serializers.ListField(
+        child=serializers.CharField(), min_length=1, max_length=20
+    )
@@ -1,4 +1,4 @@
-from . import views
+from . import views, async_views
 from django.urls import path
 from rest_framework.routers import DefaultRouter
 
@@ -9,4 +9,19 @@ router.register("task", views.TaskModelViewSet, basename="task")
 
 urlpatterns = [
     path("weather/", views.WeatherApiView.as_view(), name="weather"),
+    path("weather/batch/", views.WeatherBatchApiView.as_view(), name="weather-batch"),
+    # async variants, routed to the ASGI workers, see the README
+    path(
+        "async/task/", async_views.AsyncTaskListView.as_view(), name="async-task-list"
+    ),
+    path(
+        "async/task/<int:pk>/",
+        async_views.AsyncTaskDetailView.as_view(),
+        name="async-task-detail",
+    ),
+    path(
+        "async/weather/",
+        async_views.AsyncWeatherApiView.as_view(),
+        name="async-weather",
+    ),
 ] + router.urls
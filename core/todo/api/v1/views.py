@@ -1,93 +1,478 @@
-from todo.models import Task
+import io
+
+from todo.models import Task, RANK_STEP, normalize_city
+from todo.imports import TaskImporter, IMPORT_TYPES
+from todo.cache import get_task_list, get_stats, invalidate_task_lists, ALL_TASKS
+from todo.weather import get_weather, get_weathers, WeatherError
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
-import requests
+from rest_framework.filters import OrderingFilter
+from rest_framework.permissions import (
+    IsAuthenticatedOrReadOnly,
+    IsAuthenticated,
+    IsAdminUser,
+)
 from rest_framework.response import Response
 from rest_framework import status
-from django.core.cache import cache
-from persiantools.jdatetime import JalaliDateTime
-import pytz
+from django.db import transaction
+from django.utils import timezone
+from django.shortcuts import get_object_or_404
+from django.http import StreamingHttpResponse
 
-from .serializers import TaskSerializer, LocationSerializer
+from .serializers import (
+    TaskSerializer,
+    TaskValuesSerializer,
+    TaskBulkItemSerializer,
+    TaskBulkDeleteSerializer,
+    TaskMoveSerializer,
+    LocationSerializer,
+    LocationBatchSerializer,
+)
 from .permissions import IsOwnerOrReadOnly
-from .paginations import DefaultPagination
-from .filters import TaskFilter
+from .paginations import DefaultPagination, TaskCursorPagination
+from .filters import TaskFilter, TaskSearchFilter
+from .exports import EXPORT_FORMATS
+from .conditional import (
+    task_etag,
+    list_etag,
+    conditional_response,
+    precondition_failed,
+    set_validators,
+)
 
 
 class TaskModelViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
     serializer_class = TaskSerializer
+    # set to None to serialize list pages with TaskSerializer
+    values_serializer_class = TaskValuesSerializer
     queryset = Task.objects.all()
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, TaskSearchFilter, OrderingFilter]
     # filterset_fields = ['title', 'complete']
     search_fields = ["title", "complete"]
     ordering_fields = ["creation_date"]
     pagination_class = DefaultPagination
+    cursor_pagination_class = TaskCursorPagination
     filterset_class = TaskFilter
+    bulk_max_items = 1000
+    bulk_batch_size = 500
+    # checked by core.middleware.QueryInspectorMiddleware
+    query_budget = 10
+
+    @property
+    def paginator(self):
+        """
+        switch to keyset pagination when the client asks for it with
+        ?pagination=cursor or sends back a cursor
+        """
+        if not hasattr(self, "_paginator") and self.use_cursor_pagination():
+            self._paginator = self.cursor_pagination_class()
+        return super().paginator
+
+    def use_cursor_pagination(self):
+        params = getattr(self.request, "query_params", {})
+        return params.get("pagination") == "cursor" or "cursor" in params
+
+    def list(self, request, *args, **kwargs):
+        """
+        serve the list page from the versioned cache, any task write bumps
+        the version so an outdated page is never returned. Clients polling
+        with If-None-Match get a 304 while the page is unchanged.
+        """
+
+        def build():
+            data = self.get_list_data(request)
+            meta = {key: value for key, value in data.items() if key != "results"}
+            return {
+                "data": data,
+                "etag": list_etag(self.get_page_tasks(), meta),
+                "last_modified": timezone.now(),
+            }
+
+        page = get_task_list(ALL_TASKS, request.build_absolute_uri(), build)
+        response = conditional_response(request, page["etag"], page["last_modified"])
+        if response is None:
+            response = Response(page["data"])
+        return set_validators(response, page["etag"], page["last_modified"])
+
+    def get_list_data(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.values_serializer_class is not None:
+            queryset = queryset.values_list(
+                *self.values_serializer_class.values_fields, named=True
+            )
+            serializer_class = self.values_serializer_class
+        else:
+            serializer_class = self.get_serializer_class()
+        page = self.paginate_queryset(queryset)
+        serializer = serializer_class(
+            page, many=True, context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data).data
+
+    def get_page_tasks(self):
+        page = self.paginator.page
+        return getattr(page, "object_list", page)
+
+    def retrieve(self, request, *args, **kwargs):
+        task = self.get_object()
+        etag = task_etag(task)
+        response = conditional_response(request, etag, task.updated_date)
+        if response is None:
+            response = Response(self.get_serializer(task).data)
+        return set_validators(response, etag, task.updated_date)
+
+    def update(self, request, *args, **kwargs):
+        """
+        PUT/PATCH honour If-Match: the stored version is checked again by
+        the UPDATE itself, so of two concurrent editors holding the same
+        etag only the first one wins and the other gets a 412
+        """
+        partial = kwargs.pop("partial", False)
+        task = self.get_object()
+        response = conditional_response(request, task_etag(task), task.updated_date)
+        if response is not None:
+            return response
+        serializer = self.get_serializer(task, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            if "HTTP_IF_MATCH" in request.META:
+                claimed = Task.objects.filter(
+                    pk=task.pk, updated_date=task.updated_date
+                ).update(updated_date=timezone.now())
+                if not claimed:
+                    return precondition_failed()
+            self.perform_update(serializer)
+        response = Response(serializer.data)
+        return set_validators(response, task_etag(task), task.updated_date)
+
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated])
+    def export(self, request):
+        """
+        stream every task of the user as ndjson (default) or ?type=csv,
+        rows are read from a server side cursor in chunks so memory stays
+        flat whatever the number of tasks. The TaskFilter filters apply.
+        """
+        export_type = request.query_params.get("type", "ndjson")
+        if export_type not in EXPORT_FORMATS:
+            return Response(
+                {"type": [f"must be one of {', '.join(EXPORT_FORMATS)}"]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        filterset = self.filterset_class(
+            request.query_params,
+            queryset=Task.objects.filter(owner=request.user),
+            request=request,
+        )
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        stream, content_type = EXPORT_FORMATS[export_type]
+        response = StreamingHttpResponse(
+            stream(filterset.qs), content_type=content_type
+        )
+        response["Content-Disposition"] = f'attachment; filename="tasks.{export_type}"'
+        return response
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        permission_classes=[IsAuthenticated],
+    )
+    def import_tasks(self, request):
+        """
+        import the csv or ndjson file uploaded as `file` into the user's
+        tasks, the type is taken from `type` or the file extension. Every
+        line with an error is reported and the others are imported. A file
+        that is not utf-8 answers 207 with what was imported before the bad
+        bytes, 400 when nothing was.
+        """
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"file": ["This field is required."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        import_type = request.data.get("type") or upload.name.rsplit(".", 1)[-1]
+        if import_type not in IMPORT_TYPES:
+            return Response(
+                {"type": [f"must be one of {', '.join(IMPORT_TYPES)}"]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        stream = io.TextIOWrapper(upload.file, encoding="utf-8", newline="")
+        stats = TaskImporter(request.profile).run(stream, import_type)
+        if "file" in stats:
+            # the lines before the bytes that are not utf-8 were imported
+            return Response(
+                stats,
+                status=(
+                    status.HTTP_207_MULTI_STATUS
+                    if stats["imported"]
+                    else status.HTTP_400_BAD_REQUEST
+                ),
+            )
+        return Response(stats)
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="cache-stats",
+        permission_classes=[IsAdminUser],
+    )
+    def cache_stats(self, request):
+        return Response(get_stats())
+
+    @action(
+        detail=False,
+        methods=["post", "patch", "delete"],
+        url_path="bulk",
+        permission_classes=[IsAuthenticated],
+    )
+    def bulk(self, request):
+        """
+        create (POST), update (PATCH) or delete (DELETE) a batch of the
+        user's tasks with a constant number of queries, the result of every
+        item is reported back in the same order it was sent
+        """
+        if request.method == "DELETE":
+            return self.bulk_delete(request)
+
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response(
+                {"detail": "expected a non empty list of tasks"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(items) > self.bulk_max_items:
+            return Response(
+                {
+                    "detail": f"a batch can not have more than {self.bulk_max_items} tasks"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        partial = request.method == "PATCH"
+        results = []
+        valid_items = []
+        for index, item in enumerate(items):
+            serializer = TaskBulkItemSerializer(data=item, partial=partial)
+            if not serializer.is_valid():
+                results.append(
+                    {"index": index, "status": "invalid", "errors": serializer.errors}
+                )
+            elif partial and "id" not in serializer.validated_data:
+                results.append(
+                    {
+                        "index": index,
+                        "status": "invalid",
+                        "errors": {"id": ["This field is required."]},
+                    }
+                )
+            elif not partial and "id" in serializer.validated_data:
+                # the database picks the primary key of a new task
+                results.append(
+                    {
+                        "index": index,
+                        "status": "invalid",
+                        "errors": {"id": ["Not allowed when creating a task."]},
+                    }
+                )
+            else:
+                result = {"index": index}
+                results.append(result)
+                valid_items.append((result, serializer.validated_data))
+
+        if partial:
+            self.bulk_update(request.user, valid_items)
+            success_status = status.HTTP_200_OK
+        else:
+            self.bulk_create(request.profile, valid_items)
+            success_status = status.HTTP_201_CREATED
+        # bulk writes do not send post_save
+        invalidate_task_lists(request.user.id)
+
+        failed = any(
+            result["status"] not in ("created", "updated") for result in results
+        )
+        return Response(
+            {"results": results},
+            status=status.HTTP_207_MULTI_STATUS if failed else success_status,
+        )
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="complete-all",
+        permission_classes=[IsAuthenticated],
+    )
+    def complete_all(self, request):
+        """
+        mark every task of the user matching the TaskFilter params complete
+        """
+        return self.apply_to_filtered(request, lambda tasks: tasks.set_complete(True))
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="undo-all",
+        permission_classes=[IsAuthenticated],
+    )
+    def undo_all(self, request):
+        """
+        mark every task of the user matching the TaskFilter params not complete
+        """
+        return self.apply_to_filtered(request, lambda tasks: tasks.set_complete(False))
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="clear-completed",
+        permission_classes=[IsAuthenticated],
+    )
+    def clear_completed(self, request):
+        """
+        delete the completed tasks of the user matching the TaskFilter params
+        """
+        return self.apply_to_filtered(request, lambda tasks: tasks.clear_completed())
+
+    def apply_to_filtered(self, request, operation):
+        filterset = self.filterset_class(
+            request.query_params,
+            queryset=Task.objects.filter(owner=request.user),
+            request=request,
+        )
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            count = operation(filterset.qs)
+            invalidate_task_lists(request.user.id)
+        return Response({"count": count})
+
+    @action(detail=True, methods=["post"])
+    def move(self, request, pk=None):
+        """
+        move the task right before or after another task of the same user
+        """
+        task = self.get_object()
+        serializer = TaskMoveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        position, anchor_id = next(iter(serializer.validated_data.items()))
+        anchor = get_object_or_404(
+            Task.objects.exclude(pk=task.pk), pk=anchor_id, user_id=task.user_id
+        )
+        task.move(**{position: anchor})
+        serializer = self.get_serializer(task)
+        return Response(serializer.data)
+
+    def bulk_create(self, profile, valid_items):
+        with transaction.atomic():
+            # bulk_create does not call save(), so the ranks are assigned
+            # here after the current last task of the user
+            next_rank = Task.objects.next_rank(profile)
+            tasks = [
+                Task(
+                    user=profile,
+                    owner_id=profile.user_id,
+                    rank=next_rank + offset * RANK_STEP,
+                    **data,
+                )
+                for offset, (_, data) in enumerate(valid_items)
+            ]
+            Task.objects.bulk_create(tasks, batch_size=self.bulk_batch_size)
+        for (result, _), task in zip(valid_items, tasks):
+            result.update({"id": task.id, "status": "created"})
+
+    def bulk_update(self, user, valid_items):
+        ids = [data["id"] for _, data in valid_items]
+        with transaction.atomic():
+            tasks = Task.objects.select_for_update().filter(owner=user, id__in=ids)
+            tasks = {task.id: task for task in tasks}
+            now = timezone.now()
+            changed = {}
+            for result, data in valid_items:
+                task = tasks.get(data["id"])
+                if task is None:
+                    result.update({"id": data["id"], "status": "not_found"})
+                    continue
+                for field in ("title", "complete"):
+                    if field in data:
+                        setattr(task, field, data[field])
+                # bulk_update does not run auto_now fields
+                task.updated_date = now
+                changed[task.id] = task
+                result.update({"id": task.id, "status": "updated"})
+            Task.objects.bulk_update(
+                changed.values(),
+                ["title", "complete", "updated_date"],
+                batch_size=self.bulk_batch_size,
+            )
+
+    def bulk_delete(self, request):
+        serializer = TaskBulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data["ids"]
+        with transaction.atomic():
+            owned = Task.objects.filter(owner=request.user, id__in=ids)
+            deleted = set(owned.values_list("id", flat=True))
+            owned.fast_delete()
+            invalidate_task_lists(request.user.id)
+        results = [
+            {
+                "index": index,
+                "id": pk,
+                "status": "deleted" if pk in deleted else "not_found",
+            }
+            for index, pk in enumerate(ids)
+        ]
+        failed = len(deleted) != len(set(ids))
+        return Response(
+            {"results": results},
+            status=status.HTTP_207_MULTI_STATUS if failed else status.HTTP_200_OK,
+        )
 
 
 class WeatherApiView(APIView):
 
     serializer_class = LocationSerializer
-    api_key = "Your api_key"
-
-    def getLatAndLon(self, cityName):
-        try:
-            latUrl = f"http://api.openweathermap.org/geo/1.0/direct?q={cityName}&appid={self.api_key}"
-            responseLat = requests.get(latUrl)
-            convertedResponseLat = responseLat.json()
-            lat = convertedResponseLat[0]["lat"]
-            lon = convertedResponseLat[0]["lon"]
-        except requests.exceptions.HTTPError as err:
-            print("HTTPError", err)
-        except requests.exceptions.ConnectionError as err:
-            print("ConnectionError", err)
-        except requests.exceptions.RequestException as err:
-            print("RequestException", err)
-        return lat, lon
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
         city_name = serializer.validated_data["city"]
+        try:
+            data = get_weather(city_name)
+        except WeatherError as err:
+            return Response(
+                {"error": str(err)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        return Response(data)
 
-        # Check if the weather data for the city is cached
-        cached_weather = cache.get(f"weather_{city_name}")
-        print(cached_weather)
-        if cached_weather:
-            # Data is found in the cache, return the cached response
-            return Response(cached_weather)
-
-        lat, lon = self.getLatAndLon(city_name)
-        if lat and lon:
-
-            try:
-                url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={self.api_key}&units=metric"
-
-                response = requests.get(url)
-                response = response.json()
-                data = {
-                    "weather": response["weather"][0]["main"],
-                    "temp": response["main"]["temp"],
-                    "humidity": response["main"]["humidity"],
-                    "sys_sunrise": JalaliDateTime.fromtimestamp(
-                        response["sys"]["sunrise"], pytz.timezone("Asia/Tehran")
-                    ).strftime("%Y-%m-%d %H:%M:%S"),
-                    "sys_sunset": JalaliDateTime.fromtimestamp(
-                        response["sys"]["sunset"], pytz.timezone("Asia/Tehran")
-                    ).strftime("%Y-%m-%d %H:%M:%S"),
-                }
-                cache.set(f"weather_{city_name}", data, timeout=1200)
-            except requests.exceptions.RequestException:
-                return Response(
-                    {"error": "Could not retrieve weather data."},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                )
 
-        else:
-            return Response({"error": "Could not retrieve coordinates."}, status=500)
+class WeatherBatchApiView(APIView):
+    """
+    Weather of several cities at once, the cities missing from the cache
+    are fetched concurrently. Answers 207 when some of them failed.
+    """
 
-        return Response(data)
+    serializer_class = LocationBatchSerializer
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        cities = serializer.validated_data["cities"]
+        weathers = get_weathers(cities)
+        results = []
+        for city in cities:
+            data = weathers[normalize_city(city)]
+            if isinstance(data, WeatherError):
+                results.append({"city": city, "error": str(data)})
+            else:
+                results.append({"city": city, **data})
+        failed = any("error" in result for result in results)
+        return Response(
+            {"results": results},
+            status=status.HTTP_207_MULTI_STATUS if failed else status.HTTP_200_OK,
+        )
@@ -0,0 +1,91 @@
+import hashlib
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+# every cached list lives under the current version token of its scope,
+# writing a new token invalidates all of them at once and old entries are
+# never read again, they just expire
+LIST_TIMEOUT = 60 * 60
+VERSION_KEY = "todo:tasks:version:{scope}"
+LIST_KEY = "todo:tasks:list:{scope}:{version}:{variant}"
+HITS_KEY = "todo:tasks:cache:hits"
+MISSES_KEY = "todo:tasks:cache:misses"
+INVALIDATIONS_KEY = "todo:tasks:cache:invalidations"
+
+# scope of the api list, which shows the tasks of every user. It has one
+# version for all its pages, so any task write of any user invalidates
+# every cached page of it: under steady writes its hit ratio drops towards
+# zero. get_stats() reports these invalidations next to the hit ratio.
+ALL_TASKS = "all"
+
+
+def user_scope(user_id):
+    return f"user:{user_id}"
+
+
+def get_version(scope):
+    return cache.get_or_set(VERSION_KEY.format(scope=scope), uuid4().hex, None)
+
+
+def invalidate_task_lists(*user_ids):
+    """
+    Bump the version of the given users' lists and of the api list.
+    Inside a transaction the versions are bumped again on commit, so a list
+    built from the not yet committed state is never served afterwards.
+    """
+    scopes = {ALL_TASKS} | {user_scope(user_id) for user_id in user_ids}
+    bump_versions(scopes)
+    count(INVALIDATIONS_KEY)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: bump_versions(scopes))
+
+
+def bump_versions(scopes):
+    cache.set_many(
+        {VERSION_KEY.format(scope=scope): uuid4().hex for scope in scopes}, None
+    )
+
+
+def get_task_list(scope, variant, build):
+    """
+    Return the cached list of a scope, build() is called on a miss
+    """
+    key = LIST_KEY.format(
+        scope=scope,
+        version=get_version(scope),
+        variant=hashlib.md5(variant.encode()).hexdigest(),
+    )
+    value = cache.get(key)
+    if value is not None:
+        count(HITS_KEY)
+        return value
+    count(MISSES_KEY)
+    value = build()
+    cache.set(key, value, LIST_TIMEOUT)
+    return value
+
+
+def count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def get_stats():
+    """
+    hits and misses of the cached lists, and how many times the whole api
+    list was invalidated by a task write, see ALL_TASKS
+    """
+    stats = cache.get_many([HITS_KEY, MISSES_KEY, INVALIDATIONS_KEY])
+    hits = stats.get(HITS_KEY, 0)
+    misses = stats.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else None,
+        "api_list_invalidations": stats.get(INVALIDATIONS_KEY, 0),
+    }
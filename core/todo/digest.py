@@ -0,0 +1,171 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from django.template.defaultfilters import pluralize
+from django.template.loader import get_template
+
+from accounts.emails import queue_emails
+from .models import Task
+
+User = get_user_model()
+
+# recipients of a chunk task, their digests go to the outbox in one INSERT
+DIGEST_CHUNK_SIZE = 1000
+DIGEST_TOP_TITLES = 5
+DIGEST_TEMPLATE = "email/digest.txt"
+DIGEST_FROM_EMAIL = "farimahtizghadam@gmail.com"
+
+# progress of the run of a day, see progress()
+DIGEST_STAT_KEY = "todo:digest:{day}:{stat}"
+# a chunk already sent, a redelivered chunk task does not send it twice
+DIGEST_CHUNK_KEY = "todo:digest:{day}:chunk:{first_id}"
+DIGEST_TIMEOUT = 60 * 60 * 48
+STATS = ("started", "total_chunks", "chunks", "users", "digests")
+
+
+def recipients():
+    return User.objects.filter(is_active=True, is_verified=True).order_by("pk")
+
+
+def chunk_bounds(chunk_size=DIGEST_CHUNK_SIZE):
+    """
+    first and last pk of every chunk of chunk_size recipients, the keys are
+    read from the primary key index chunk after chunk
+    """
+    bounds = []
+    last_id = 0
+    while True:
+        ids = list(
+            recipients()
+            .filter(pk__gt=last_id)
+            .values_list("pk", flat=True)[:chunk_size]
+        )
+        if not ids:
+            return bounds
+        bounds.append((ids[0], ids[-1]))
+        last_id = ids[-1]
+
+
+def open_tasks(first_id, last_id, top=DIGEST_TOP_TITLES):
+    """
+    {owner id: (open task count, titles of the first `top` by rank)} of the
+    owners in a pk range, in one query: the count and the position of each
+    task are window functions over its owner's tasks
+    """
+    by_owner = [F("owner_id")]
+    rows = (
+        Task.objects.filter(
+            owner_id__gte=first_id, owner_id__lte=last_id, complete=False
+        )
+        .annotate(
+            position=Window(
+                RowNumber(), partition_by=by_owner, order_by=[F("rank"), F("id")]
+            ),
+            open_count=Window(Count("id"), partition_by=by_owner),
+        )
+        .filter(position__lte=top)
+        .order_by("owner_id", "position")
+        .values_list("owner_id", "open_count", "title")
+    )
+    tasks = {}
+    for owner_id, count, title in rows:
+        tasks.setdefault(owner_id, (count, []))[1].append(title)
+    return tasks
+
+
+def start(day, total_chunks):
+    """
+    Record the start of the run of a day, False when it already started
+    """
+    if not cache.add(stat_key(day, "started"), time.time(), DIGEST_TIMEOUT):
+        return False
+    cache.set_many(
+        {
+            stat_key(day, "total_chunks"): total_chunks,
+            stat_key(day, "chunks"): 0,
+            stat_key(day, "users"): 0,
+            stat_key(day, "digests"): 0,
+        },
+        DIGEST_TIMEOUT,
+    )
+    return True
+
+
+def send_chunk(day, first_id, last_id):
+    """
+    Render the digests of the recipients in a pk range and hand them to the
+    outbox. Recipients without open tasks get none. The template is loaded
+    once and rendered for every recipient.
+    """
+    chunk_key = DIGEST_CHUNK_KEY.format(day=day, first_id=first_id)
+    if not cache.add(chunk_key, True, DIGEST_TIMEOUT):
+        return {"users": 0, "digests": 0, "skipped": True}
+    try:
+        stats = render_chunk(first_id, last_id)
+    except Exception:
+        # the chunk is sent again when its task is retried
+        cache.delete(chunk_key)
+        raise
+    add(stat_key(day, "chunks"), 1)
+    add(stat_key(day, "users"), stats["users"])
+    add(stat_key(day, "digests"), stats["digests"])
+    return {**stats, "skipped": False}
+
+
+def render_chunk(first_id, last_id):
+    template = get_template(DIGEST_TEMPLATE)
+    tasks = open_tasks(first_id, last_id)
+    users = recipients().filter(pk__gte=first_id, pk__lte=last_id)
+    messages = []
+    count = 0
+    for pk, email in users.values_list("pk", "email"):
+        count += 1
+        if pk not in tasks:
+            continue
+        open_count, titles = tasks[pk]
+        context = {
+            "email": email,
+            "count": open_count,
+            "titles": titles,
+            "more": open_count - len(titles),
+        }
+        messages.append(
+            {
+                "subject": f"You have {open_count} open task{pluralize(open_count)}",
+                "body": template.render(context),
+                "from_email": DIGEST_FROM_EMAIL,
+                "to": [email],
+            }
+        )
+    with transaction.atomic():
+        queue_emails(messages)
+    return {"users": count, "digests": len(messages)}
+
+
+def progress(day):
+    """
+    chunks done out of the total, users scanned, digests queued and users
+    scanned per second of the run of a day
+    """
+    values = cache.get_many([stat_key(day, stat) for stat in STATS])
+    stats = {stat: values.get(stat_key(day, stat)) for stat in STATS}
+    started = stats.pop("started")
+    if started is None:
+        return None
+    elapsed = time.time() - started
+    stats["elapsed"] = round(elapsed, 3)
+    stats["users_per_second"] = round(stats["users"] / elapsed, 1) if elapsed else None
+    return stats
+
+
+def stat_key(day, stat):
+    return DIGEST_STAT_KEY.format(day=day, stat=stat)
+
+
+def add(key, amount):
+    if not cache.add(key, amount, DIGEST_TIMEOUT):
+        cache.incr(key, amount)
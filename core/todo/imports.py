@@ -0,0 +1,180 @@
+import csv
+import io
+import json
+import time
+
+from django.db import connection, transaction
+
+from .cache import invalidate_task_lists
+from .models import Task, RANK_STEP
+
+IMPORT_BATCH_SIZE = 50000
+# only the first errors are kept in the report, the rest are only counted
+IMPORT_MAX_REPORTED_ERRORS = 1000
+IMPORT_TYPES = ("csv", "ndjson")
+STAGING_TABLE = "todo_task_import"
+
+TRUE_VALUES = {"1", "true", "t", "yes", "y"}
+FALSE_VALUES = {"", "0", "false", "f", "no", "n"}
+
+
+class TaskImporter:
+    """
+    Load tasks of a profile from a CSV or NDJSON stream.
+    Lines are parsed and validated in a single streaming pass and written in
+    batches: on postgres every batch is COPYed into a temporary staging table
+    and merged into todo_task with one INSERT ... SELECT, other databases use
+    bulk_create. Each batch commits on its own and progress(stats) is called
+    after it. Bytes that are not utf-8 stop the import, the lines read before
+    are imported and stats["file"] tells where it stopped.
+    """
+
+    def __init__(self, profile, batch_size=IMPORT_BATCH_SIZE, progress=None):
+        self.profile = profile
+        self.batch_size = batch_size
+        self.progress = progress
+        self.title_max_length = Task._meta.get_field("title").max_length
+        self.stats = {"lines": 0, "imported": 0, "failed": 0, "errors": []}
+
+    def run(self, stream, import_type):
+        started = time.monotonic()
+        use_copy = connection.vendor == "postgresql"
+        if use_copy:
+            self.create_staging_table()
+        try:
+            batch = []
+            line = 0
+            try:
+                for line, record in self.parse(stream, import_type):
+                    self.stats["lines"] += 1
+                    row = self.validate(line, record)
+                    if row is not None:
+                        batch.append(row)
+                    if len(batch) == self.batch_size:
+                        self.write(batch, use_copy)
+                        batch = []
+            except UnicodeDecodeError:
+                # earlier batches are already committed, the report says so
+                self.stats["file"] = [
+                    f"the file must be utf-8 encoded, it was read up to line {line}"
+                ]
+            if batch:
+                self.write(batch, use_copy)
+        finally:
+            if use_copy:
+                self.drop_staging_table()
+            invalidate_task_lists(self.profile.user_id)
+        self.stats["elapsed"] = round(time.monotonic() - started, 3)
+        return self.stats
+
+    def parse(self, stream, import_type):
+        if import_type == "csv":
+            reader = csv.DictReader(stream)
+            while True:
+                try:
+                    record = next(reader)
+                except StopIteration:
+                    return
+                except csv.Error:
+                    # a NUL byte before python 3.11, the line is reported
+                    record = None
+                yield reader.line_num, record
+        for line, text in enumerate(stream, start=1):
+            if not text.strip():
+                continue
+            try:
+                record = json.loads(text)
+            except ValueError:
+                record = None
+            yield line, record
+
+    def validate(self, line, record):
+        if not isinstance(record, dict):
+            self.add_error(line, {"line": ["not a valid record"]})
+            return None
+        errors = {}
+        title = record.get("title")
+        if not isinstance(title, str) or not title.strip():
+            errors["title"] = ["This field is required."]
+        elif "\x00" in title:
+            # postgres text can not hold NUL, COPY would fail the whole batch
+            errors["title"] = ["Null characters are not allowed."]
+        elif len(title) > self.title_max_length:
+            errors["title"] = [
+                f"Ensure this field has no more than {self.title_max_length} characters."
+            ]
+        complete = record.get("complete", False)
+        if not isinstance(complete, bool):
+            value = str(complete).strip().lower()
+            if value in TRUE_VALUES:
+                complete = True
+            elif value in FALSE_VALUES:
+                complete = False
+            else:
+                errors["complete"] = ["Must be a valid boolean."]
+        if errors:
+            self.add_error(line, errors)
+            return None
+        return line, title, complete
+
+    def add_error(self, line, errors):
+        self.stats["failed"] += 1
+        if len(self.stats["errors"]) < IMPORT_MAX_REPORTED_ERRORS:
+            self.stats["errors"].append({"line": line, "errors": errors})
+
+    def write(self, batch, use_copy):
+        with transaction.atomic():
+            next_rank = Task.objects.next_rank(self.profile)
+            if use_copy:
+                self.copy_batch(batch, next_rank)
+            else:
+                Task.objects.bulk_create(
+                    [
+                        Task(
+                            user=self.profile,
+                            owner_id=self.profile.user_id,
+                            title=title,
+                            complete=complete,
+                            rank=next_rank + offset * RANK_STEP,
+                        )
+                        for offset, (_, title, complete) in enumerate(batch)
+                    ],
+                    batch_size=1000,
+                )
+        self.stats["imported"] += len(batch)
+        if self.progress is not None:
+            self.progress(self.stats)
+
+    def create_staging_table(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} "
+                "(line bigint, title text, complete boolean)"
+            )
+
+    def drop_staging_table(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+
+    def copy_batch(self, batch, next_rank):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for line, title, complete in batch:
+            writer.writerow((line, title, "t" if complete else "f"))
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {STAGING_TABLE}")
+            cursor.copy_expert(
+                f"COPY {STAGING_TABLE} (line, title, complete) "
+                "FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+            # the search_vector trigger fills the vector of the new rows
+            cursor.execute(
+                f"INSERT INTO {Task._meta.db_table} "
+                "(user_id, owner_id, title, complete, rank, creation_date, updated_date) "
+                "SELECT %s, %s, title, complete, "
+                "%s + (row_number() OVER (ORDER BY line) - 1) * %s, now(), now() "
+                f"FROM {STAGING_TABLE} ORDER BY line",
+                [self.profile.pk, self.profile.user_id, next_rank, RANK_STEP],
+            )
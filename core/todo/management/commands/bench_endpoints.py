@@ -0,0 +1,260 @@
+import json
+import time
+import tracemalloc
+from itertools import count
+from unittest import mock
+
+import requests
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from accounts.models import User, Profile
+from todo.models import Task, RANK_STEP
+
+PASSWORD = "Bench@123456"
+DEFAULT_SIZES = "100,1000"
+
+
+def fake_openweather(session, method, url, *args, **kwargs):
+    """
+    Answer the OpenWeather calls without leaving the process
+    """
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    if "/geo/" in url:
+        body = [{"lat": 35.69, "lon": 51.39}]
+    else:
+        body = {
+            "weather": [{"main": "Clear"}],
+            "main": {"temp": 21.5, "humidity": 30},
+            "sys": {"sunrise": 1700000000, "sunset": 1700040000},
+        }
+    response._content = json.dumps(body).encode()
+    return response
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Command(BaseCommand):
+    help = (
+        "measure latency, query count and allocated memory of the main "
+        "endpoints, run it with --settings=core.bench_settings"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default=DEFAULT_SIZES,
+            help="comma separated numbers of tasks of the benchmarked user",
+        )
+        parser.add_argument("--iterations", type=int, default=30)
+        parser.add_argument("--output", help="write the results to this json file")
+        parser.add_argument(
+            "--baseline", help="compare the results with this json file"
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.5,
+            help="allowed relative p95 slowdown against the baseline",
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options["sizes"].split(",")]
+        self.iterations = options["iterations"]
+        self.sequence = count()
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, keepdb=False)
+        try:
+            with mock.patch("requests.sessions.Session.request", fake_openweather):
+                results = {
+                    "database": connection.vendor,
+                    "iterations": self.iterations,
+                    "sizes": {str(size): self.run_size(size) for size in sizes},
+                }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.report(results)
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+                output.write("\n")
+        if options["baseline"]:
+            with open(options["baseline"]) as baseline:
+                regressions = self.compare(
+                    json.load(baseline), results, options["tolerance"]
+                )
+            for regression in regressions:
+                self.stderr.write(regression)
+            if regressions:
+                raise CommandError(f"{len(regressions)} regressions against baseline")
+            self.stdout.write(self.style.SUCCESS("no regression against baseline"))
+
+    def run_size(self, size):
+        Task.objects.all().delete()
+        User.objects.all().delete()
+        cache.clear()
+
+        user = User.objects.create_user(
+            email="bench@example.com", password=PASSWORD, is_verified=True
+        )
+        profile = Profile.objects.get(user=user)
+        Task.objects.bulk_create(
+            [
+                Task(
+                    user=profile,
+                    owner=user,
+                    title=f"bench task {position}",
+                    complete=position % 3 == 0,
+                    rank=position * RANK_STEP,
+                )
+                for position in range(1, size + 1)
+            ],
+            batch_size=1000,
+        )
+        task = Task.objects.filter(user=profile).first()
+
+        api = APIClient()
+        api.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user).key}"
+        )
+        anonymous = APIClient()
+        web = Client()
+        web.force_login(user)
+
+        list_url = reverse("task:api-v1:task-list")
+        detail_url = reverse("task:api-v1:task-detail", kwargs={"pk": task.pk})
+        # reads come first so the writes do not grow the lists they measure
+        endpoints = {
+            "task_list": lambda: anonymous.get(list_url),
+            "task_list_uncached": lambda: self.uncached(anonymous.get, list_url),
+            "task_list_cursor": lambda: self.uncached(
+                anonymous.get, list_url, {"pagination": "cursor"}
+            ),
+            "task_detail": lambda: api.get(detail_url),
+            "task_list_html": lambda: web.get(reverse("task:task_list")),
+            "weather": lambda: self.uncached(
+                api.post, reverse("task:api-v1:weather"), {"city": "Tehran"}
+            ),
+            "task_export": lambda: self.consume(
+                api.get(reverse("task:api-v1:task-export"), {"type": "ndjson"})
+            ),
+            "task_create": lambda: api.post(
+                list_url, {"title": "bench", "complete": False}
+            ),
+            "task_update": lambda: api.patch(detail_url, {"complete": True}),
+            "task_bulk_create": lambda: api.post(
+                reverse("task:api-v1:task-bulk"),
+                [{"title": f"bulk {item}"} for item in range(50)],
+                format="json",
+            ),
+            "token_login": lambda: anonymous.post(
+                reverse("accounts:api-V1:token-login"),
+                {"email": user.email, "password": PASSWORD},
+            ),
+            "jwt_create": lambda: anonymous.post(
+                reverse("accounts:api-V1:jwt-create"),
+                {"email": user.email, "password": PASSWORD},
+            ),
+            "registration": lambda: anonymous.post(
+                reverse("accounts:api-V1:registration"),
+                {
+                    "email": f"new{next(self.sequence)}@example.com",
+                    "password": PASSWORD,
+                    "password_confirm": PASSWORD,
+                },
+            ),
+        }
+        return {name: self.measure(name, call) for name, call in endpoints.items()}
+
+    def uncached(self, method, *args):
+        cache.clear()
+        return method(*args)
+
+    def consume(self, response):
+        for _ in response.streaming_content:
+            pass
+        return response
+
+    def measure(self, name, call):
+        # warm up imports, url resolving and the caches of the cached variants
+        response = call()
+        if response.status_code >= 400:
+            raise CommandError(f"{name} answered {response.status_code}")
+
+        with CaptureQueriesContext(connection) as queries:
+            call()
+        query_count = len(queries)
+
+        timings = []
+        for _ in range(self.iterations):
+            started = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - started) * 1000)
+
+        # tracing slows every allocation down, so it gets a run of its own
+        tracemalloc.start()
+        try:
+            call()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        return {
+            "p50_ms": round(percentile(timings, 0.5), 3),
+            "p95_ms": round(percentile(timings, 0.95), 3),
+            "queries": query_count,
+            "peak_kb": round(peak / 1024, 1),
+        }
+
+    def report(self, results):
+        for size, endpoints in results["sizes"].items():
+            self.stdout.write(f"{size} tasks ({results['database']})")
+            for name, result in endpoints.items():
+                self.stdout.write(
+                    f"  {name:<20} p50 {result['p50_ms']:>9.2f} ms  "
+                    f"p95 {result['p95_ms']:>9.2f} ms  "
+                    f"{result['queries']:>3} queries  {result['peak_kb']:>9.1f} KB"
+                )
+
+    def compare(self, baseline, results, tolerance):
+        """
+        More queries than the baseline is always a regression, latency and
+        memory only when they grow beyond the tolerance
+        """
+        regressions = []
+        for size, endpoints in results["sizes"].items():
+            for name, result in endpoints.items():
+                base = baseline["sizes"].get(size, {}).get(name)
+                if base is None:
+                    continue
+                label = f"{name} ({size} tasks)"
+                if result["queries"] > base["queries"]:
+                    regressions.append(
+                        f"{label}: {result['queries']} queries, "
+                        f"baseline {base['queries']}"
+                    )
+                for metric in ("p95_ms", "peak_kb"):
+                    if result[metric] > base[metric] * (1 + tolerance):
+                        regressions.append(
+                            f"{label}: {metric} {result[metric]}, "
+                            f"baseline {base[metric]}"
+                        )
+        return regressions
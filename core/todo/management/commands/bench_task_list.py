@@ -0,0 +1,69 @@
+import time
+from collections import namedtuple
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.request import Request
+
+from todo.api.v1.serializers import TaskSerializer, TaskValuesSerializer
+from todo.models import Task
+
+
+class Command(BaseCommand):
+    help = "benchmark TaskSerializer against the values_list fast path of lists"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        request = Request(
+            RequestFactory().get("/api/v1/task/"), parser_context={"kwargs": {}}
+        )
+        context = {"request": request}
+
+        now = timezone.now()
+        tasks = [
+            Task(
+                id=pk,
+                user_id=1,
+                title=f"task {pk}",
+                complete=bool(pk % 2),
+                rank=pk,
+                creation_date=now,
+                updated_date=now,
+            )
+            for pk in range(1, rows + 1)
+        ]
+        Row = namedtuple("Row", TaskValuesSerializer.values_fields)
+        values = [
+            Row(*(getattr(task, field) for field in TaskValuesSerializer.values_fields))
+            for task in tasks
+        ]
+
+        model_time, model_data = self.measure(
+            lambda: TaskSerializer(tasks, many=True, context=context).data,
+            options["repeat"],
+        )
+        values_time, values_data = self.measure(
+            lambda: TaskValuesSerializer(values, many=True, context=context).data,
+            options["repeat"],
+        )
+        if [dict(item) for item in model_data] != list(values_data):
+            self.stderr.write("the two serializers do not return the same data")
+
+        self.stdout.write(f"rows: {rows}")
+        self.stdout.write(f"TaskSerializer: {model_time * 1000:.1f} ms")
+        self.stdout.write(f"TaskValuesSerializer: {values_time * 1000:.1f} ms")
+        self.stdout.write(f"speedup: {model_time / values_time:.1f}x")
+
+    def measure(self, serialize, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            data = serialize()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, data
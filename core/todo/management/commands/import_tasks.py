@@ -0,0 +1,55 @@
+import io
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import Profile
+from todo.imports import TaskImporter, IMPORT_BATCH_SIZE, IMPORT_TYPES
+
+
+class Command(BaseCommand):
+    help = "importing tasks of a user from a csv or ndjson file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="file to import, - reads stdin")
+        parser.add_argument("--email", required=True, help="owner of the tasks")
+        parser.add_argument("--type", choices=IMPORT_TYPES)
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            profile = Profile.objects.get(user__email=options["email"])
+        except Profile.DoesNotExist:
+            raise CommandError(f"user {options['email']} does not exist")
+
+        path = options["path"]
+        import_type = options["type"] or path.rsplit(".", 1)[-1]
+        if import_type not in IMPORT_TYPES:
+            raise CommandError("use --type to tell the type of the file")
+
+        importer = TaskImporter(
+            profile, batch_size=options["batch_size"], progress=self.report
+        )
+        if path == "-":
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+            stats = importer.run(stream, import_type)
+        else:
+            with open(path, encoding="utf-8", newline="") as stream:
+                stats = importer.run(stream, import_type)
+
+        for error in stats["errors"]:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        for error in stats.get("file", []):
+            self.stderr.write(error)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"imported {stats['imported']} of {stats['lines']} lines "
+                f"({stats['failed']} failed) in {stats['elapsed']}s"
+            )
+        )
+
+    def report(self, stats):
+        self.stdout.write(
+            f"{stats['lines']} lines read, {stats['imported']} imported, "
+            f"{stats['failed']} failed"
+        )
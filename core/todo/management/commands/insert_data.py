@@ -1,10 +1,16 @@
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import make_password
 from django.core.management.base import BaseCommand
+from django.db import connection, connections
 from faker import Faker
-import random
-from datetime import datetime
 
 from accounts.models import User, Profile
-from todo.models import Task
+from todo.cache import invalidate_task_lists
+from todo.models import Task, RANK_STEP
 
 category_list = [
     "IT",
@@ -13,26 +19,156 @@ category_list = [
     "IOT",
 ]
 
+PASSWORD = "Test@123456"
+# users generated by one unit of work of the pool
+CHUNK_USERS = 5000
+BATCH_SIZE = 5000
+# titles are picked from a pool of sentences, calling faker for each of
+# millions of tasks would dominate the run time
+SENTENCE_POOL_SIZE = 2000
+
+
+def tasks_per_user(users, mean, skew, rng):
+    """
+    Number of tasks of every user, uniform when skew is 0, otherwise a
+    zipf like distribution of exponent skew that keeps the same total
+    """
+    if skew <= 0:
+        return [mean] * users
+    weights = [1 / (position**skew) for position in range(1, users + 1)]
+    scale = mean * users / sum(weights)
+    counts = [round(weight * scale) for weight in weights]
+    rng.shuffle(counts)
+    return counts
+
+
+def setup_worker():
+    django.setup()
+
+
+def generate_chunk(chunk, first_index, counts, seed, password):
+    """
+    Create the users, profiles and tasks of one chunk, the chunk seed makes
+    the generated data the same for the same --seed
+    """
+    fake = Faker()
+    fake.seed_instance(f"{seed}-{chunk}")
+    rng = random.Random(f"{seed}-{chunk}")
+    sentences = [
+        fake.sentence(nb_words=6)[:-1]
+        for _ in range(min(SENTENCE_POOL_SIZE, max(sum(counts), 1)))
+    ]
+
+    users = [
+        User(email=f"user{seed}.{first_index + offset}@{fake.free_email_domain()}")
+        for offset in range(len(counts))
+    ]
+    for user in users:
+        user.password = password
+    User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+
+    profiles = [
+        Profile(
+            user=user,
+            first_name=fake.first_name(),
+            last_name=fake.last_name(),
+            description=fake.paragraph(nb_sentences=2),
+        )
+        for user in users
+    ]
+    Profile.objects.bulk_create(profiles, batch_size=BATCH_SIZE)
+
+    tasks = []
+    created = 0
+    for profile, count in zip(profiles, counts):
+        for position in range(1, count + 1):
+            tasks.append(
+                Task(
+                    user=profile,
+                    owner_id=profile.user_id,
+                    title=f"[{rng.choice(category_list)}] {rng.choice(sentences)}",
+                    complete=rng.random() < 0.3,
+                    rank=position * RANK_STEP,
+                )
+            )
+            if len(tasks) == BATCH_SIZE:
+                Task.objects.bulk_create(tasks)
+                created += len(tasks)
+                tasks = []
+    if tasks:
+        Task.objects.bulk_create(tasks)
+        created += len(tasks)
+    return len(users), created
+
 
 class Command(BaseCommand):
     help = "inserting dummy data"
 
-    def __init__(self, *args, **kwargs):
-        super(Command, self).__init__(*args, **kwargs)
-        self.fake = Faker()
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1)
+        parser.add_argument("--tasks-per-user", type=int, default=5)
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=0,
+            help="zipf exponent of the tasks per user, 0 gives every user the same",
+        )
+        parser.add_argument("--seed", type=int, help="seed of a repeatable dataset")
+        parser.add_argument("--workers", type=int, default=1)
 
     def handle(self, *args, **options):
-        user = User.objects.create_user(email=self.fake.email(), password="Test@123456")
-        profile = Profile.objects.get(user=user)
-
-        profile.first_name = self.fake.first_name()
-        profile.last_name = self.fake.last_name()
-        profile.description = self.fake.paragraph(nb_sentences=5)
-        profile.save()
-
-        for _ in range(5):
-            Task.objects.create(
-                user=profile,
-                title=self.fake.paragraph(nb_sentences=1)[:-1],
-                complete=random.choice([True, False]),
+        started = time.monotonic()
+        seed = options["seed"]
+        if seed is None:
+            seed = random.randrange(1 << 30)
+        rng = random.Random(seed)
+
+        counts = tasks_per_user(
+            options["users"], options["tasks_per_user"], options["skew"], rng
+        )
+        # hashing is slow on purpose, every generated user shares one hash
+        password = make_password(PASSWORD)
+        chunks = []
+        for chunk, first in enumerate(range(0, len(counts), CHUNK_USERS)):
+            last = first + CHUNK_USERS
+            chunks.append((chunk, first, counts[first:last], seed, password))
+
+        workers = options["workers"]
+        if workers > 1 and connection.vendor == "sqlite":
+            self.stderr.write("sqlite has a single writer, using one worker")
+            workers = 1
+
+        users = tasks = 0
+        if workers > 1:
+            # the workers open their own connections
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=setup_worker
+            ) as pool:
+                futures = [pool.submit(generate_chunk, *chunk) for chunk in chunks]
+                for future in futures:
+                    created_users, created_tasks = future.result()
+                    users += created_users
+                    tasks += created_tasks
+                    self.report(users, tasks, started)
+        else:
+            for chunk in chunks:
+                created_users, created_tasks = generate_chunk(*chunk)
+                users += created_users
+                tasks += created_tasks
+                self.report(users, tasks, started)
+        invalidate_task_lists()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"created {users} users and {tasks} tasks with seed {seed} "
+                f"(password {PASSWORD})"
             )
+        )
+
+    def report(self, users, tasks, started):
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f"{users} users, {tasks} tasks, {elapsed:.1f}s "
+            f"({tasks / elapsed if elapsed else 0:.0f} tasks/s)"
+        )
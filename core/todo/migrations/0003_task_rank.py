@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:05
+
+from django.db import migrations, models
+from django.db.models import F
+
+RANK_STEP = 1 << 16
+
+
+def ranks_from_order(apps, schema_editor):
+    # one set-based UPDATE, the dense _order becomes a sparse rank
+    Task = apps.get_model("todo", "Task")
+    Task.objects.update(rank=(F("_order") + 1) * RANK_STEP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("todo", "0002_task_creation_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="task",
+            name="rank",
+            field=models.BigIntegerField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.RunPython(ranks_from_order, migrations.RunPython.noop),
+        migrations.AlterOrderWithRespectTo(
+            name="task",
+            order_with_respect_to=None,
+        ),
+        migrations.AlterModelOptions(
+            name="task",
+            options={"ordering": ["rank", "id"]},
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(fields=["user", "rank"], name="task_user_rank_idx"),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:40
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+def create_search_objects(apps, schema_editor):
+    """
+    keep search_vector in sync with a trigger, backfill it in id batches and
+    build the GIN indexes without locking the table for writes
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        "CREATE TRIGGER todo_task_search_vector_trigger "
+        "BEFORE INSERT OR UPDATE OF title ON todo_task FOR EACH ROW "
+        "EXECUTE FUNCTION tsvector_update_trigger("
+        "search_vector, 'pg_catalog.simple', title)"
+    )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT coalesce(max(id), 0) FROM todo_task")
+        (max_id,) = cursor.fetchone()
+    for start in range(0, max_id, BACKFILL_BATCH_SIZE):
+        schema_editor.execute(
+            "UPDATE todo_task SET search_vector = to_tsvector('pg_catalog.simple', title) "
+            "WHERE id > %s AND id <= %s",
+            [start, start + BACKFILL_BATCH_SIZE],
+        )
+    schema_editor.execute(
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS todo_task_search_vector_gin "
+        "ON todo_task USING gin (search_vector)"
+    )
+    schema_editor.execute(
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS todo_task_title_trgm "
+        "ON todo_task USING gin (title gin_trgm_ops)"
+    )
+
+
+def drop_search_objects(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS todo_task_title_trgm")
+    schema_editor.execute("DROP INDEX IF EXISTS todo_task_search_vector_gin")
+    schema_editor.execute(
+        "DROP TRIGGER IF EXISTS todo_task_search_vector_trigger ON todo_task"
+    )
+
+
+class Migration(migrations.Migration):
+
+    # the backfill commits batch by batch and CREATE INDEX CONCURRENTLY can
+    # not run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("todo", "0003_task_rank"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name="task",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(create_search_objects, drop_search_objects),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:04
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+BACKFILL_BATCH_SIZE = 10000
+OWNER_INDEX = models.Index(fields=["owner", "rank"], name="task_owner_rank_idx")
+
+
+def backfill_owner(apps, schema_editor):
+    """
+    copy the user of every task's profile in id batches, each batch commits
+    on its own so the table is never locked as a whole
+    """
+    Task = apps.get_model("todo", "Task")
+    Profile = apps.get_model("accounts", "Profile")
+    owner = Subquery(
+        Profile.objects.filter(pk=OuterRef("user_id")).values("user_id")[:1]
+    )
+    max_id = Task.objects.aggregate(max_id=models.Max("id"))["max_id"] or 0
+    for start in range(0, max_id, BACKFILL_BATCH_SIZE):
+        Task.objects.filter(
+            id__gt=start, id__lte=start + BACKFILL_BATCH_SIZE, user__isnull=False
+        ).update(owner_id=owner)
+
+
+def add_owner_index(apps, schema_editor):
+    Task = apps.get_model("todo", "Task")
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.add_index(Task, OWNER_INDEX, concurrently=True)
+    else:
+        schema_editor.add_index(Task, OWNER_INDEX)
+
+
+def remove_owner_index(apps, schema_editor):
+    Task = apps.get_model("todo", "Task")
+    schema_editor.remove_index(Task, OWNER_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    # the backfill commits batch by batch and CREATE INDEX CONCURRENTLY can
+    # not run inside a transaction
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("accounts", "0003_profile_user_one_to_one"),
+        ("todo", "0004_task_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="task",
+            name="owner",
+            field=models.ForeignKey(
+                db_index=False,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="tasks",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.RunPython(backfill_owner, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(add_owner_index, remove_owner_index),
+            ],
+            state_operations=[
+                migrations.AddIndex(model_name="task", index=OWNER_INDEX),
+            ],
+        ),
+    ]
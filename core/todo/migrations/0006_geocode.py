@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("todo", "0005_task_owner"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Geocode",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("lat", models.FloatField()),
+                ("lon", models.FloatField()),
+                ("creation_date", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -1,5 +1,79 @@
-from django.db import models
+from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import Max, Min
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Profile
+from .cache import invalidate_task_lists
+
+# gap between two neighbouring ranks, a task can be moved between two
+# others about log2(RANK_STEP) times before the user's ranks are rebalanced
+RANK_STEP = 1 << 16
+
+# text search configuration of Task.search_vector, "simple" does not stem
+# so titles in any language are indexed the same way
+SEARCH_CONFIG = "simple"
+
+
+class TaskQuerySet(models.QuerySet):
+    """
+    Set based state changes, each one is a single statement. They send no
+    signals, the caller invalidates the cached lists of the owners.
+    """
+
+    def set_complete(self, complete):
+        """
+        Mark the tasks complete or not, rows already in that state are left
+        alone so their updated_date stays right. Returns the changed count.
+        """
+        return self.exclude(complete=complete).update(
+            complete=complete, updated_date=timezone.now()
+        )
+
+    def clear_completed(self):
+        """
+        Delete the completed tasks, returns the deleted count
+        """
+        return self.filter(complete=True).fast_delete()
+
+    def fast_delete(self):
+        """
+        Delete the tasks with a single DELETE, without loading them and
+        without the delete signals. Returns the deleted count.
+        This is only correct while no model has a foreign key to Task, as
+        nothing is cascaded or set null. It refuses to run once one does, so
+        every caller gets revisited instead of leaving orphans.
+        """
+        if self.model._meta.related_objects:
+            raise RuntimeError(
+                f"{self.model.__name__} has reverse relations, a fast delete "
+                "would not cascade to them"
+            )
+        return self._raw_delete(self.db)
+
+
+class TaskManager(models.Manager.from_queryset(TaskQuerySet)):
+    """
+    Manager that keeps the sparse rank of the tasks of a user
+    """
+
+    def next_rank(self, user):
+        last = self.filter(user=user).aggregate(last=Max("rank"))["last"]
+        return RANK_STEP if last is None else last + RANK_STEP
+
+    def rebalance(self, user):
+        """
+        Spread the ranks of a user's tasks evenly again, this is the only
+        operation that rewrites every row of the user
+        """
+        tasks = list(self.filter(user=user).order_by("rank", "id").only("id", "rank"))
+        for position, task in enumerate(tasks, start=1):
+            task.rank = position * RANK_STEP
+        self.bulk_update(tasks, ["rank"], batch_size=1000)
 
 
 class Task(models.Model):
@@ -10,16 +84,131 @@ class Task(models.Model):
     user = models.ForeignKey(
         "accounts.Profile", on_delete=models.CASCADE, null=True, blank=True
     )
+    # the auth user of the profile, copied on save so ownership checks and
+    # per user filters need neither the profile row nor a join
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        editable=False,
+        db_index=False,
+        related_name="tasks",
+    )
     title = models.CharField(max_length=200)
     complete = models.BooleanField(default=False)
+    rank = models.BigIntegerField(editable=False)
     creation_date = models.DateTimeField(auto_now_add=True)
     updated_date = models.DateTimeField(auto_now=True)
+    # filled by a database trigger on postgres, see migration 0004
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = TaskManager()
 
     def __str__(self):
         return self.title
 
     class Meta:
-        order_with_respect_to = "user"
+        ordering = ["rank", "id"]
+        indexes = [
+            models.Index(fields=["creation_date", "id"], name="task_creation_id_idx"),
+            models.Index(fields=["user", "rank"], name="task_user_rank_idx"),
+            models.Index(fields=["owner", "rank"], name="task_owner_rank_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # profile the loaded owner belongs to
+        instance._owner_profile_id = instance.__dict__.get("user_id")
+        return instance
+
+    def save(self, *args, **kwargs):
+        if self.rank is None:
+            self.rank = Task.objects.next_rank(self.user_id)
+        if self.user_id != getattr(self, "_owner_profile_id", object()):
+            self.owner_id = self.get_owner_id()
+            self._owner_profile_id = self.user_id
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "owner"}
+        super().save(*args, **kwargs)
+
+    def get_owner_id(self):
+        if self.user_id is None:
+            return None
+        if Task.user.is_cached(self):
+            return self.user.user_id
+        return (
+            Profile.objects.filter(pk=self.user_id)
+            .values_list("user_id", flat=True)
+            .first()
+        )
 
     def get_absolute_api_url(self):
         return reverse("task:api-v1:task-detail", kwargs={"pk": self.id})
+
+    def move(self, before=None, after=None):
+        """
+        Place the task right before or right after another task of the same
+        user. Only this row is written, unless there is no gap left between
+        the two neighbours and the user's ranks have to be rebalanced first.
+        """
+        anchor = before if before is not None else after
+        with transaction.atomic():
+            for _ in range(2):
+                anchor.refresh_from_db(fields=["rank"])
+                siblings = Task.objects.filter(user_id=self.user_id).exclude(pk=self.pk)
+                if before is not None:
+                    high = anchor.rank
+                    low = siblings.filter(rank__lt=high).aggregate(low=Max("rank"))[
+                        "low"
+                    ]
+                    low = high - 2 * RANK_STEP if low is None else low
+                else:
+                    low = anchor.rank
+                    high = siblings.filter(rank__gt=low).aggregate(high=Min("rank"))[
+                        "high"
+                    ]
+                    high = low + 2 * RANK_STEP if high is None else high
+                if high - low >= 2:
+                    break
+                Task.objects.rebalance(self.user_id)
+            self.rank = (low + high) // 2
+            Task.objects.filter(pk=self.pk).update(rank=self.rank)
+        invalidate_task_lists(self.owner_id)
+
+
+class Geocode(models.Model):
+    """
+    Coordinates of a city, name is normalized with normalize_city
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+    lat = models.FloatField()
+    lon = models.FloatField()
+    creation_date = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+def normalize_city(name):
+    return " ".join(name.split()).casefold()
+
+
+@receiver([post_save, post_delete], sender=Task)
+def invalidate_owner_task_lists(sender, instance, **kwargs):
+    """
+    drop the cached lists that contain the saved or deleted task
+    """
+    invalidate_task_lists(instance.owner_id)
+
+
+@receiver(post_save, sender=Profile)
+def sync_task_owner(sender, instance, created, **kwargs):
+    """
+    follow a profile moved to another user
+    """
+    if not created:
+        Task.objects.filter(user=instance).exclude(owner_id=instance.user_id).update(
+            owner_id=instance.user_id
+        )
@@ -1,10 +1,129 @@
+import logging
+import time
+
 from celery import shared_task
-from time import sleep
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.utils import timezone
 from todo.models import Task
+from todo.cache import invalidate_task_lists
+from todo import digest, weather
+
+logger = logging.getLogger(__name__)
+
+PURGE_CHUNK_SIZE = 1000
+PURGE_MAX_ROWS_PER_RUN = 100000
+PURGE_CHECKPOINT_KEY = "todo:purge_completed:last_id"
+PURGE_LOCK_KEY = "todo:purge_completed:lock"
+PURGE_LOCK_TIMEOUT = 60 * 30
+
+
+@shared_task
+def completeTask(chunk_size=PURGE_CHUNK_SIZE, max_rows=PURGE_MAX_ROWS_PER_RUN):
+    """
+    Purge completed tasks in primary key chunks.
+    Every chunk is a single DELETE, the last purged id is saved after each
+    chunk so a killed worker resumes where it stopped, and a run stops after
+    max_rows so the nightly cleanup never holds the table for long.
+    """
+    if not cache.add(PURGE_LOCK_KEY, True, timeout=PURGE_LOCK_TIMEOUT):
+        logger.info("purge of completed tasks is already running, skipping")
+        return {"deleted": 0, "chunks": 0, "skipped": True}
+
+    started = time.monotonic()
+    last_id = cache.get(PURGE_CHECKPOINT_KEY, 0)
+    deleted = 0
+    chunks = 0
+    finished = False
+    try:
+        while deleted < max_rows:
+            rows = list(
+                Task.objects.filter(complete=True, id__gt=last_id)
+                .order_by("id")
+                .values_list("id", "owner_id")[: min(chunk_size, max_rows - deleted)]
+            )
+            if not rows:
+                finished = True
+                break
+            ids = [pk for pk, _ in rows]
+
+            # skips loading the rows and the per row signals
+            deleted += Task.objects.filter(id__in=ids, complete=True).fast_delete()
+            chunks += 1
+            invalidate_task_lists(*{user_id for _, user_id in rows})
+            last_id = ids[-1]
+            cache.set(PURGE_CHECKPOINT_KEY, last_id, timeout=None)
+    finally:
+        cache.delete(PURGE_LOCK_KEY)
+
+    if finished:
+        # the whole table has been scanned, the next run starts over
+        cache.delete(PURGE_CHECKPOINT_KEY)
+
+    stats = {
+        "deleted": deleted,
+        "chunks": chunks,
+        "last_id": last_id,
+        "finished": finished,
+        "elapsed": round(time.monotonic() - started, 3),
+    }
+    logger.info("purged completed tasks: %s", stats)
+    return stats
 
 
 @shared_task
-def completeTask():
-    tasks = Task.objects.filter(complete=True)
-    for task in tasks:
-        task.delete()
+def refresh_weather(city):
+    """
+    Background refresh of a stale weather entry, see weather.get_weather
+    """
+    try:
+        entry = cache.get(weather.WEATHER_KEY.format(city=city))
+        weather.refresh(city, entry, weather.fetch_weather)
+    except weather.WeatherError as err:
+        logger.warning("weather refresh of %s failed: %s", city, err)
+    finally:
+        cache.delete(weather.REFRESH_QUEUED_KEY.format(city=city))
+
+
+@shared_task
+def prewarm_weather():
+    """
+    Periodic refresh of the most requested cities, scheduled by celery beat
+    """
+    stats = weather.prewarm()
+    logger.info("pre-warmed the weather cache: %s", stats)
+    return stats
+
+
+@shared_task
+def send_daily_digest(chunk_size=digest.DIGEST_CHUNK_SIZE):
+    """
+    Fan out the daily open tasks digest, one send_digest_chunk task per
+    chunk of chunk_size recipients so the workers render them in parallel.
+    A day is sent once, a second run the same day does nothing.
+    """
+    day = timezone.localdate().isoformat()
+    bounds = digest.chunk_bounds(chunk_size)
+    if not digest.start(day, len(bounds)):
+        logger.info("the digest of %s is already sent, skipping", day)
+        return {"day": day, "chunks": 0, "skipped": True}
+    for first_id, last_id in bounds:
+        send_digest_chunk.delay(day, first_id, last_id)
+    return {"day": day, "chunks": len(bounds), "skipped": False}
+
+
+@shared_task(autoretry_for=(DatabaseError,), retry_backoff=True, max_retries=3)
+def send_digest_chunk(day, first_id, last_id):
+    stats = digest.send_chunk(day, first_id, last_id)
+    progress = digest.progress(day)
+    if progress is not None:
+        logger.info(
+            "digest of %s: %s/%s chunks, %s users, %s digests, %s users/s",
+            day,
+            progress["chunks"],
+            progress["total_chunks"],
+            progress["users"],
+            progress["digests"],
+            progress["users_per_second"],
+        )
+    return stats
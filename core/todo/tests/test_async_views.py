@@ -0,0 +1,107 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import AsyncClient
+from django.urls import reverse
+
+from accounts.models import User, Profile
+from todo import weather
+from todo.models import Task
+from todo.tests.test_weather import FakeResponse
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    weather.get_coordinates.cache_clear()
+    yield
+    cache.clear()
+    weather.get_coordinates.cache_clear()
+
+
+@pytest.fixture
+def client():
+    client = AsyncClient()
+    return client
+
+
+@pytest.fixture
+def tasks():
+    user = User.objects.create_user(email="admin@admin.com", password="@/1234567")
+    profile = Profile.objects.get(user=user)
+    return [Task.objects.create(user=profile, title=f"task {i}") for i in range(3)]
+
+
+@pytest.mark.django_db
+class TestAsyncTaskApi:
+
+    def test_list_pages_like_the_sync_list(self, client, tasks):
+        url = reverse("task:api-v1:async-task-list")
+        response = async_to_sync(client.get)(url, {"page": 2})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total_objects"] == 3
+        assert data["total_pages"] == 2
+        assert data["links"] == {"next": None, "previous": "http://testserver" + url}
+        assert [task["id"] for task in data["results"]] == [tasks[2].id]
+        assert data["results"][0]["relative_url"] == reverse(
+            "task:api-v1:task-detail", kwargs={"pk": tasks[2].id}
+        )
+
+    def test_list_applies_the_filters_and_search(self, client, tasks):
+        url = reverse("task:api-v1:async-task-list")
+        response = async_to_sync(client.get)(url, {"title": "task 1"})
+        assert [task["id"] for task in response.json()["results"]] == [tasks[1].id]
+        response = async_to_sync(client.get)(url, {"search": "task 2"})
+        assert [task["id"] for task in response.json()["results"]] == [tasks[2].id]
+        response = async_to_sync(client.get)(url, {"from_date": "not a date"})
+        assert response.status_code == 400
+        assert "from_date" in response.json()
+
+    def test_invalid_page_is_404(self, client, tasks):
+        url = reverse("task:api-v1:async-task-list")
+        response = async_to_sync(client.get)(url, {"page": 3})
+        assert response.status_code == 404
+        assert response.json() == {"detail": "Invalid page."}
+
+    def test_detail_honours_if_none_match(self, client, tasks):
+        url = reverse("task:api-v1:async-task-detail", kwargs={"pk": tasks[0].id})
+        response = async_to_sync(client.get)(url)
+        assert response.status_code == 200
+        assert response.json()["title"] == "task 0"
+        response = async_to_sync(client.get)(
+            url, headers={"if-none-match": response["ETag"]}
+        )
+        assert response.status_code == 304
+
+    def test_missing_task_is_404(self, client):
+        url = reverse("task:api-v1:async-task-detail", kwargs={"pk": 1})
+        response = async_to_sync(client.get)(url)
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAsyncWeatherApi:
+
+    def test_weather_is_fetched_then_cached(self, client, monkeypatch):
+        calls = []
+
+        def fake_get(url, **kwargs):
+            calls.append(url)
+            return FakeResponse(url)
+
+        monkeypatch.setattr(weather.openweather, "get", fake_get)
+        url = reverse("task:api-v1:async-weather")
+        for city in ("Tehran", "tehran"):
+            response = async_to_sync(client.post)(
+                url, {"city": city}, content_type="application/json"
+            )
+            assert response.status_code == 200
+        assert response.json()["weather"] == "Clear"
+        assert len(calls) == 2
+
+    def test_city_is_required(self, client):
+        url = reverse("task:api-v1:async-weather")
+        response = async_to_sync(client.post)(url, {}, content_type="application/json")
+        assert response.status_code == 400
+        assert "city" in response.json()
@@ -0,0 +1,70 @@
+import random
+
+import pytest
+from django.core.management import call_command
+
+from accounts.models import User, Profile
+from todo.models import Task
+from todo.management.commands.insert_data import tasks_per_user, PASSWORD
+from todo.management.commands.bench_endpoints import (
+    Command as BenchCommand,
+    percentile,
+)
+
+
+@pytest.mark.django_db
+class TestInsertDataCommand:
+
+    def test_insert_data_creates_users_profiles_and_tasks(self):
+        call_command("insert_data", users=4, tasks_per_user=3, seed=7)
+        assert User.objects.count() == 4
+        assert Profile.objects.count() == 4
+        assert Task.objects.count() == 12
+        user = User.objects.first()
+        assert user.check_password(PASSWORD)
+        assert Task.objects.filter(user__user=user).count() == 3
+
+    def test_insert_data_is_repeatable_for_a_seed(self):
+        call_command("insert_data", users=2, tasks_per_user=2, seed=3)
+        first = list(Task.objects.values_list("title", "complete"))
+        Task.objects.all().delete()
+        User.objects.all().delete()
+        call_command("insert_data", users=2, tasks_per_user=2, seed=3)
+        assert list(Task.objects.values_list("title", "complete")) == first
+
+    def test_tasks_per_user_skew_keeps_the_total(self):
+        counts = tasks_per_user(100, 10, 1.2, random.Random(1))
+        assert abs(sum(counts) - 1000) <= 50
+        assert max(counts) > 10 * min(counts)
+
+
+class TestBenchEndpointsCommand:
+
+    def test_percentile(self):
+        samples = list(range(1, 101))
+        assert percentile(samples, 0.5) == 51
+        assert percentile(samples, 0.95) == 96
+        assert percentile([3.0], 0.95) == 3.0
+
+    def test_compare_reports_extra_queries_and_slowdowns(self):
+        baseline = {
+            "sizes": {
+                "100": {
+                    "task_list": {"p95_ms": 2.0, "queries": 2, "peak_kb": 50.0},
+                    "task_detail": {"p95_ms": 2.0, "queries": 2, "peak_kb": 50.0},
+                }
+            }
+        }
+        results = {
+            "sizes": {
+                "100": {
+                    "task_list": {"p95_ms": 2.5, "queries": 3, "peak_kb": 50.0},
+                    "task_detail": {"p95_ms": 4.0, "queries": 2, "peak_kb": 40.0},
+                    "weather": {"p95_ms": 9.0, "queries": 9, "peak_kb": 90.0},
+                }
+            }
+        }
+        regressions = BenchCommand().compare(baseline, results, 0.5)
+        assert len(regressions) == 2
+        assert regressions[0].startswith("task_list (100 tasks): 3 queries")
+        assert regressions[1].startswith("task_detail (100 tasks): p95_ms")
@@ -0,0 +1,137 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from core.http import HttpClient, CircuitBreaker, CircuitOpen
+
+
+class FakeUpstream(BaseHTTPRequestHandler):
+    """
+    answers with the statuses of server.statuses in turn, then 200
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits += 1
+            server.clients.add(self.client_address)
+            status = server.statuses.pop(0) if server.statuses else 200
+        time.sleep(server.delay)
+        body = b'{"ok": true}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeUpstream)
+    server.lock = threading.Lock()
+    server.hits = 0
+    server.clients = set()
+    server.statuses = []
+    server.delay = 0
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestHttpClient:
+
+    def test_connections_are_kept_alive(self, upstream):
+        client = HttpClient()
+        for _ in range(5):
+            assert client.get(upstream.url).json() == {"ok": True}
+        assert upstream.hits == 5
+        assert len(upstream.clients) == 1
+
+    def test_read_timeout(self, upstream):
+        upstream.delay = 0.5
+        client = HttpClient(timeout=(1, 0.1), retries=0)
+        started = time.monotonic()
+        with pytest.raises(requests.exceptions.Timeout):
+            client.get(upstream.url)
+        assert time.monotonic() - started < 0.5
+
+    def test_server_errors_are_retried(self, upstream):
+        upstream.statuses = [503, 502]
+        client = HttpClient(retries=2, backoff=0)
+        assert client.get(upstream.url).status_code == 200
+        assert upstream.hits == 3
+
+    def test_client_errors_are_not_retried_nor_counted(self, upstream):
+        upstream.statuses = [404] * 3
+        breaker = CircuitBreaker(min_calls=2)
+        client = HttpClient(breaker=breaker)
+        for _ in range(3):
+            with pytest.raises(requests.exceptions.HTTPError):
+                client.get(upstream.url)
+        assert upstream.hits == 3
+        assert breaker.state == "closed"
+
+    def test_circuit_opens_then_probes(self, upstream):
+        upstream.statuses = [500] * 4
+        breaker = CircuitBreaker(min_calls=4, open_timeout=0.2)
+        client = HttpClient(retries=0, breaker=breaker)
+        for _ in range(4):
+            with pytest.raises(requests.exceptions.HTTPError):
+                client.get(upstream.url)
+        assert breaker.state == "open"
+        with pytest.raises(CircuitOpen):
+            client.get(upstream.url)
+        assert upstream.hits == 4
+
+        time.sleep(0.25)
+        assert breaker.state == "half-open"
+        assert client.get(upstream.url).status_code == 200
+        assert breaker.state == "closed"
+        assert upstream.hits == 5
+
+    def test_only_the_probe_closes_the_circuit(self):
+        breaker = CircuitBreaker(min_calls=2, open_timeout=0.1)
+        slow = breaker.allow()
+        assert slow == "closed"
+        for _ in range(2):
+            breaker.record(False, breaker.allow())
+        assert breaker.state == "open"
+        # the slow call admitted while closed succeeds after the opening
+        breaker.record(True, slow)
+        assert breaker.state == "open"
+
+        time.sleep(0.15)
+        probe = breaker.allow()
+        assert probe == "probe"
+        assert breaker.allow() is None
+        breaker.record(True, slow)
+        assert breaker.state == "half-open"
+        breaker.record(True, probe)
+        assert breaker.state == "closed"
+
+    def test_probe_raising_another_error_frees_the_slot(self, monkeypatch):
+        breaker = CircuitBreaker(min_calls=1, open_timeout=0.1)
+        breaker.record(False, breaker.allow())
+        client = HttpClient(breaker=breaker)
+
+        def broken(*args, **kwargs):
+            raise ValueError("broken adapter")
+
+        monkeypatch.setattr(client.session, "request", broken)
+        time.sleep(0.15)
+        with pytest.raises(ValueError):
+            client.get("http://upstream/")
+        assert breaker.state == "open"
+        time.sleep(0.15)
+        assert breaker.allow() == "probe"
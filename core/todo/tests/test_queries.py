@@ -0,0 +1,72 @@
+import logging
+
+import pytest
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import User, Profile
+from core.middleware import QueryRecorder, QueryBudgetExceeded, normalize
+from todo.api.v1.views import TaskModelViewSet
+from todo.models import Task
+
+
+@pytest.fixture
+def inspector(settings):
+    settings.QUERY_INSPECTOR = True
+    settings.QUERY_BUDGET_RAISE = True
+    return settings
+
+
+@pytest.fixture
+def tasks():
+    user = User.objects.create_user(email="admin@admin.com", password="@/1234567")
+    profile = Profile.objects.get(user=user)
+    return [Task.objects.create(user=profile, title=f"task {i}") for i in range(6)]
+
+
+@pytest.mark.django_db
+class TestQueryInspector:
+
+    def test_normalize_folds_in_lists(self):
+        assert normalize('WHERE "id" IN (%s, %s, %s)') == normalize(
+            'WHERE "id" IN (%s)'
+        )
+
+    def test_recorder_reports_repeated_statements(self, tasks):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for task in Task.objects.all():
+                task.user.user
+        repeated = recorder.repeated(5)
+        assert recorder.total == 13
+        assert [item["count"] for item in repeated] == [6, 6]
+        assert repeated[0]["call_site"].startswith("todo/tests/test_queries.py:")
+
+    def test_list_counts_queries_within_budget(self, inspector, tasks):
+        response = APIClient().get(reverse("task:api-v1:task-list"))
+        assert response.status_code == 200
+        report = response.query_report
+        assert report["view"] == "todo.api.v1.views.TaskModelViewSet"
+        assert report["total"] <= TaskModelViewSet.query_budget
+        assert response["X-Query-Count"] == str(report["total"])
+        assert report["repeated"] == []
+
+    def test_exceeding_budget_raises(self, inspector, tasks, monkeypatch):
+        monkeypatch.setattr(TaskModelViewSet, "query_budget", 0)
+        with pytest.raises(QueryBudgetExceeded):
+            APIClient().get(reverse("task:api-v1:task-list"))
+
+    def test_exceeding_budget_is_logged_without_raise(
+        self, inspector, tasks, monkeypatch, caplog
+    ):
+        inspector.QUERY_BUDGET_RAISE = False
+        monkeypatch.setattr(TaskModelViewSet, "query_budget", 0)
+        with caplog.at_level(logging.WARNING, logger="core.queries"):
+            response = APIClient().get(reverse("task:api-v1:task-list"))
+        assert response.status_code == 200
+        assert "the budget of todo.api.v1.views.TaskModelViewSet is 0" in caplog.text
+
+    def test_disabled_by_default(self, tasks):
+        response = APIClient().get(reverse("task:api-v1:task-list"))
+        assert not response.has_header("X-Query-Count")
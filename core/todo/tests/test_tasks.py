@@ -0,0 +1,114 @@
+import pytest
+from django.core.cache import cache
+
+from accounts.models import User, Profile, OutboxEmail
+from todo import digest
+from todo.models import Task
+from todo.tasks import (
+    completeTask,
+    send_daily_digest,
+    send_digest_chunk,
+    PURGE_CHECKPOINT_KEY,
+)
+
+
+@pytest.fixture
+def common_profile():
+    user = User.objects.create_user(email="admin@admin.com", password="@/1234567")
+    return Profile.objects.get(user=user)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.mark.django_db
+class TestPurgeCompletedTasks:
+
+    def test_purge_deletes_only_completed_tasks(self, common_profile):
+        for i in range(7):
+            Task.objects.create(user=common_profile, title=f"done {i}", complete=True)
+        Task.objects.create(user=common_profile, title="open")
+
+        stats = completeTask(chunk_size=3)
+
+        assert stats["deleted"] == 7
+        assert stats["chunks"] == 3
+        assert stats["finished"] is True
+        assert list(Task.objects.values_list("title", flat=True)) == ["open"]
+        assert cache.get(PURGE_CHECKPOINT_KEY) is None
+
+    def test_purge_stops_at_max_rows_and_resumes(self, common_profile):
+        tasks = [
+            Task.objects.create(user=common_profile, title=f"done {i}", complete=True)
+            for i in range(5)
+        ]
+
+        stats = completeTask(chunk_size=2, max_rows=3)
+
+        assert stats["deleted"] == 3
+        assert stats["finished"] is False
+        assert cache.get(PURGE_CHECKPOINT_KEY) == tasks[2].id
+
+        stats = completeTask(chunk_size=2, max_rows=3)
+
+        assert stats["deleted"] == 2
+        assert stats["finished"] is True
+        assert not Task.objects.exists()
+
+
+def digest_user(email, open_tasks=0, done_tasks=0, **kwargs):
+    kwargs.setdefault("is_verified", True)
+    user = User.objects.create_user(email=email, password="@/1234567", **kwargs)
+    profile = Profile.objects.get(user=user)
+    for i in range(open_tasks):
+        Task.objects.create(user=profile, title=f"open {i}")
+    for i in range(done_tasks):
+        Task.objects.create(user=profile, title=f"done {i}", complete=True)
+    return user
+
+
+@pytest.mark.django_db
+class TestDailyDigest:
+
+    def test_open_tasks_of_a_chunk_are_one_query(self, django_assert_num_queries):
+        first = digest_user("first@test.com", open_tasks=7, done_tasks=2)
+        last = digest_user("last@test.com", open_tasks=1)
+        with django_assert_num_queries(1):
+            tasks = digest.open_tasks(first.pk, last.pk, top=3)
+        assert tasks == {
+            first.pk: (7, ["open 0", "open 1", "open 2"]),
+            last.pk: (1, ["open 0"]),
+        }
+
+    def test_digests_are_queued_once_a_day(self, monkeypatch):
+        # the chunk tasks run inline instead of being queued
+        monkeypatch.setattr(
+            send_digest_chunk, "delay", lambda *args: send_digest_chunk(*args)
+        )
+        with_tasks = digest_user("tasks@test.com", open_tasks=6)
+        digest_user("done@test.com", done_tasks=1)
+        digest_user("unverified@test.com", open_tasks=1, is_verified=False)
+        digest_user("more@test.com", open_tasks=1)
+
+        stats = send_daily_digest(chunk_size=2)
+
+        assert stats["chunks"] == 2
+        emails = OutboxEmail.objects.order_by("id")
+        assert [email.to for email in emails] == [["tasks@test.com"], ["more@test.com"]]
+        assert emails[0].subject == "You have 6 open tasks"
+        assert "- open 4" in emails[0].body
+        assert "and 1 more." in emails[0].body
+        assert emails[1].subject == "You have 1 open task"
+
+        progress = digest.progress(stats["day"])
+        assert progress["chunks"] == progress["total_chunks"] == 2
+        assert progress["users"] == 3
+        assert progress["digests"] == 2
+
+        Task.objects.create(user=with_tasks.profile, title="late")
+        assert send_daily_digest(chunk_size=2)["skipped"] is True
+        assert OutboxEmail.objects.count() == 2
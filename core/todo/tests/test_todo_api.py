@@ -1,9 +1,26 @@
+import functools
+import json
 import pytest
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework.test import APIClient
 
 from accounts.models import User, Profile
-from todo.models import Task
+from todo.models import Task, RANK_STEP
+from todo.cache import get_stats
+from todo.api.v1 import views
+from todo.api.v1.views import TaskModelViewSet
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
 
 
 @pytest.fixture
@@ -26,13 +43,12 @@ def another_user():
 
 @pytest.fixture
 def common_profile(common_user):
-    user = common_user
-    profile = Profile.objects.create(
-        user=user,
-        first_name="test_first_name",
-        last_name="test_last_name",
-        description="test_description",
-    )
+    # every user gets its profile when it is created
+    profile = Profile.objects.get(user=common_user)
+    profile.first_name = "test_first_name"
+    profile.last_name = "test_last_name"
+    profile.description = "test_description"
+    profile.save()
     return profile
 
 
@@ -180,3 +196,429 @@ class TestTodoApi:
         api_client.force_authenticate(user=user)
         response = api_client.delete(url)
         assert response.status_code == 204
+
+    def test_cursor_pagination_walks_all_tasks(self, api_client, common_profile):
+        for i in range(5):
+            Task.objects.create(user=common_profile, title=f"task {i}")
+        url = reverse("task:api-v1:task-list") + "?pagination=cursor&page_size=2"
+        seen = []
+        while url:
+            response = api_client.get(url)
+            assert response.status_code == 200
+            assert "total_objects" not in response.data
+            seen += [task["id"] for task in response.data["results"]]
+            url = response.data["links"]["next"]
+        assert seen == list(
+            Task.objects.order_by("-creation_date", "-id").values_list("id", flat=True)
+        )
+
+    def test_cursor_pagination_previous_and_count(self, api_client, common_profile):
+        for i in range(3):
+            Task.objects.create(user=common_profile, title=f"task {i}")
+        query = "?pagination=cursor&page_size=2&count=true&ordering=creation_date"
+        url = reverse("task:api-v1:task-list") + query
+        first = api_client.get(url)
+        assert first.data["total_objects"] == 3
+        assert first.data["links"]["previous"] is None
+        second = api_client.get(first.data["links"]["next"])
+        assert len(second.data["results"]) == 1
+        back = api_client.get(second.data["links"]["previous"])
+        assert back.data["results"] == first.data["results"]
+
+    def test_cursor_pagination_invalid_cursor_404(self, api_client):
+        url = reverse("task:api-v1:task-list") + "?cursor=cD1nYXJiYWdl"
+        response = api_client.get(url)
+        assert response.status_code == 404
+
+    def test_bulk_create_tasks_constant_queries(
+        self, api_client, common_user, django_assert_max_num_queries
+    ):
+        url = reverse("task:api-v1:task-bulk")
+        data = [{"title": f"task {i}"} for i in range(50)] + [{"complete": True}]
+        api_client.force_authenticate(user=common_user)
+        with django_assert_max_num_queries(8):
+            response = api_client.post(url, data, format="json")
+        assert response.status_code == 207
+        results = response.data["results"]
+        assert [r["status"] for r in results] == ["created"] * 50 + ["invalid"]
+        assert "title" in results[-1]["errors"]
+        assert Task.objects.filter(user__user=common_user).count() == 50
+
+    def test_bulk_create_refuses_client_ids(self, api_client, common_user):
+        task = Task.objects.create(
+            user=Profile.objects.get(user=common_user), title="mine"
+        )
+        url = reverse("task:api-v1:task-bulk")
+        data = [{"id": task.id, "title": "overwritten"}, {"title": "new"}]
+        api_client.force_authenticate(user=common_user)
+        response = api_client.post(url, data, format="json")
+        assert response.status_code == 207
+        results = response.data["results"]
+        assert [r["status"] for r in results] == ["invalid", "created"]
+        assert "id" in results[0]["errors"]
+        task.refresh_from_db()
+        assert task.title == "mine"
+        titles = Task.objects.filter(owner=common_user).values_list("title", flat=True)
+        assert sorted(titles) == ["mine", "new"]
+
+    def test_bulk_update_tasks(self, api_client, common_user, another_user):
+        task = Task.objects.create(
+            user=Profile.objects.get(user=common_user), title="mine"
+        )
+        other_task = Task.objects.create(
+            user=Profile.objects.get(user=another_user), title="not mine"
+        )
+        url = reverse("task:api-v1:task-bulk")
+        data = [
+            {"id": task.id, "complete": True},
+            {"id": other_task.id, "title": "hijacked"},
+        ]
+        api_client.force_authenticate(user=common_user)
+        response = api_client.patch(url, data, format="json")
+        assert response.status_code == 207
+        statuses = [r["status"] for r in response.data["results"]]
+        assert statuses == ["updated", "not_found"]
+        task.refresh_from_db()
+        other_task.refresh_from_db()
+        assert task.complete is True
+        assert task.title == "mine"
+        assert other_task.title == "not mine"
+
+    def test_bulk_delete_tasks(self, api_client, common_user):
+        task = Task.objects.create(
+            user=Profile.objects.get(user=common_user), title="mine"
+        )
+        url = reverse("task:api-v1:task-bulk")
+        api_client.force_authenticate(user=common_user)
+        response = api_client.delete(url, {"ids": [task.id]}, format="json")
+        assert response.status_code == 200
+        assert response.data["results"][0]["status"] == "deleted"
+        assert not Task.objects.filter(id=task.id).exists()
+
+    def test_bulk_response_401_status(self, api_client):
+        url = reverse("task:api-v1:task-bulk")
+        response = api_client.post(url, [{"title": "x"}], format="json")
+        assert response.status_code == 401
+
+    def test_move_task_before_another_task(self, api_client, common_user):
+        profile = Profile.objects.get(user=common_user)
+        first, second, third = [
+            Task.objects.create(user=profile, title=title)
+            for title in ("first", "second", "third")
+        ]
+        url = reverse("task:api-v1:task-move", kwargs={"pk": third.id})
+        api_client.force_authenticate(user=common_user)
+        response = api_client.post(url, {"before": second.id}, format="json")
+        assert response.status_code == 200
+        titles = Task.objects.filter(user=profile).values_list("title", flat=True)
+        assert list(titles) == ["first", "third", "second"]
+        first.refresh_from_db()
+        second.refresh_from_db()
+        assert (first.rank, second.rank) == (RANK_STEP, 2 * RANK_STEP)
+
+    def test_move_task_rebalances_when_gap_is_used_up(
+        self, api_client, common_user, monkeypatch
+    ):
+        monkeypatch.setattr("todo.models.RANK_STEP", 2)
+        profile = Profile.objects.get(user=common_user)
+        first, second, third = [
+            Task.objects.create(user=profile, title=title)
+            for title in ("first", "second", "third")
+        ]
+        third.move(after=first)
+        second.move(after=first)
+        titles = Task.objects.filter(user=profile).values_list("title", flat=True)
+        assert list(titles) == ["first", "second", "third"]
+
+    def test_move_task_to_another_users_task_404_status(
+        self, api_client, common_user, another_user
+    ):
+        task = Task.objects.create(
+            user=Profile.objects.get(user=common_user), title="mine"
+        )
+        other_task = Task.objects.create(
+            user=Profile.objects.get(user=another_user), title="not mine"
+        )
+        url = reverse("task:api-v1:task-move", kwargs={"pk": task.id})
+        api_client.force_authenticate(user=common_user)
+        response = api_client.post(url, {"after": other_task.id}, format="json")
+        assert response.status_code == 404
+
+    def test_search_tasks_by_title(self, api_client, common_user):
+        profile = Profile.objects.get(user=common_user)
+        Task.objects.create(user=profile, title="buy milk")
+        Task.objects.create(user=profile, title="write the report")
+        url = reverse("task:api-v1:task-list") + "?search=milk"
+        response = api_client.get(url)
+        assert response.status_code == 200
+        titles = [task["title"] for task in response.data["results"]]
+        assert titles == ["buy milk"]
+
+    def test_task_list_is_served_from_cache_until_a_task_changes(
+        self, api_client, common_user, django_assert_num_queries
+    ):
+        profile = Profile.objects.get(user=common_user)
+        task = Task.objects.create(user=profile, title="first")
+        url = reverse("task:api-v1:task-list")
+        assert api_client.get(url).data["total_objects"] == 1
+        with django_assert_num_queries(0):
+            assert api_client.get(url).data["total_objects"] == 1
+
+        task.title = "renamed"
+        task.save()
+        response = api_client.get(url)
+        assert response.data["results"][0]["title"] == "renamed"
+
+        task.delete()
+        assert api_client.get(url).data["total_objects"] == 0
+        assert get_stats() == {
+            "hits": 1,
+            "misses": 3,
+            "hit_ratio": 0.25,
+            "api_list_invalidations": 3,
+        }
+
+    def test_html_task_list_cache_is_per_user(self, client, common_user, another_user):
+        Task.objects.create(user=Profile.objects.get(user=common_user), title="mine")
+        client.force_login(common_user)
+        assert [t.title for t in client.get("/").context["tasks"]] == ["mine"]
+        client.force_login(another_user)
+        assert list(client.get("/").context["tasks"]) == []
+        Task.objects.create(user=Profile.objects.get(user=another_user), title="new")
+        assert [t.title for t in client.get("/").context["tasks"]] == ["new"]
+
+    def test_task_detail_304_status_code_with_matching_etag(
+        self, api_client, common_task
+    ):
+        url = reverse("task:api-v1:task-detail", kwargs={"pk": common_task.id})
+        response = api_client.get(url)
+        assert response.status_code == 200
+        assert "Last-Modified" in response
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        assert response.status_code == 304
+
+    def test_task_list_304_status_code_until_a_task_changes(
+        self, api_client, common_task
+    ):
+        url = reverse("task:api-v1:task-list")
+        etag = api_client.get(url)["ETag"]
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        common_task.complete = True
+        common_task.save()
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_update_task_412_status_code_with_stale_etag(
+        self, api_client, common_user, common_task
+    ):
+        url = reverse("task:api-v1:task-detail", kwargs={"pk": common_task.id})
+        etag = api_client.get(url)["ETag"]
+        api_client.force_authenticate(user=common_user)
+        first = api_client.patch(url, {"title": "first"}, HTTP_IF_MATCH=etag)
+        assert first.status_code == 200
+        assert first["ETag"] != etag
+        second = api_client.patch(url, {"title": "second"}, HTTP_IF_MATCH=etag)
+        assert second.status_code == 412
+        common_task.refresh_from_db()
+        assert common_task.title == "first"
+
+    def test_task_list_fast_path_matches_task_serializer(
+        self, api_client, common_user, monkeypatch
+    ):
+        profile = Profile.objects.get(user=common_user)
+        Task.objects.create(user=profile, title="first")
+        Task.objects.create(user=profile, title="second", complete=True)
+        url = reverse("task:api-v1:task-list") + "?page=1&ordering=creation_date"
+        fast = api_client.get(url).data
+        cache.clear()
+        monkeypatch.setattr(TaskModelViewSet, "values_serializer_class", None)
+        slow = api_client.get(url).data
+        assert fast == slow
+
+    def test_export_tasks_as_ndjson(self, api_client, common_user, another_user):
+        Task.objects.create(user=Profile.objects.get(user=common_user), title="mine")
+        Task.objects.create(user=Profile.objects.get(user=another_user), title="x")
+        url = reverse("task:api-v1:task-export")
+        api_client.force_authenticate(user=common_user)
+        response = api_client.get(url)
+        assert response.status_code == 200
+        assert response["Content-Type"] == "application/x-ndjson"
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        assert [json.loads(line)["title"] for line in lines] == ["mine"]
+
+    def test_export_tasks_as_csv_with_date_filter(self, api_client, common_user):
+        Task.objects.create(user=Profile.objects.get(user=common_user), title="mine")
+        url = reverse("task:api-v1:task-export") + "?type=csv&from_date=2999-01-01"
+        api_client.force_authenticate(user=common_user)
+        response = api_client.get(url)
+        assert response.status_code == 200
+        content = b"".join(response.streaming_content).decode()
+        assert content.splitlines() == ["id,title,complete,creation_date,updated_date"]
+
+    def test_export_tasks_401_status_code(self, api_client):
+        response = api_client.get(reverse("task:api-v1:task-export"))
+        assert response.status_code == 401
+
+    def test_import_tasks_from_csv_reports_bad_lines(self, api_client, common_user):
+        content = b"title,complete\nfirst,true\n,false\nsecond,maybe\nthird,\n"
+        upload = SimpleUploadedFile("tasks.csv", content, content_type="text/csv")
+        url = reverse("task:api-v1:task-import-tasks")
+        api_client.force_authenticate(user=common_user)
+        response = api_client.post(url, {"file": upload}, format="multipart")
+        assert response.status_code == 200
+        assert response.data["imported"] == 2
+        assert [error["line"] for error in response.data["errors"]] == [3, 4]
+        titles = Task.objects.filter(user__user=common_user).values_list(
+            "title", flat=True
+        )
+        assert list(titles) == ["first", "third"]
+
+    def test_import_stopped_by_bad_bytes_reports_the_imported_lines(
+        self, api_client, common_user, monkeypatch
+    ):
+        monkeypatch.setattr(
+            views, "TaskImporter", functools.partial(views.TaskImporter, batch_size=100)
+        )
+        lines = b"".join(b"task %d\n" % i for i in range(2000))
+        upload = SimpleUploadedFile("tasks.csv", b"title\n" + lines + b"bad \xff\n")
+        url = reverse("task:api-v1:task-import-tasks")
+        api_client.force_authenticate(user=common_user)
+        response = api_client.post(url, {"file": upload}, format="multipart")
+        assert response.status_code == 207
+        assert "utf-8" in response.data["file"][0]
+        assert 100 <= response.data["imported"] < 2000
+        imported = Task.objects.filter(owner=common_user).count()
+        assert imported == response.data["imported"]
+
+        upload = SimpleUploadedFile("tasks.csv", b"title\nbad \xff\n")
+        response = api_client.post(url, {"file": upload}, format="multipart")
+        assert response.status_code == 400
+        assert response.data["imported"] == 0
+
+    def test_import_reports_null_characters_as_line_errors(
+        self, api_client, common_user
+    ):
+        url = reverse("task:api-v1:task-import-tasks")
+        api_client.force_authenticate(user=common_user)
+        uploads = [
+            ("tasks.csv", b"title\nfirst\nbad\x00title\nsecond\n"),
+            ("tasks.ndjson", b'{"title": "first"}\n{"title": "bad\\u0000"}\n'),
+        ]
+        for name, content in uploads:
+            upload = SimpleUploadedFile(name, content)
+            response = api_client.post(url, {"file": upload}, format="multipart")
+            assert response.status_code == 200
+            assert [error["line"] for error in response.data["errors"]] == [
+                3 if name.endswith("csv") else 2
+            ]
+        titles = Task.objects.filter(owner=common_user).values_list("title", flat=True)
+        assert "\x00" not in "".join(titles)
+
+    def test_import_tasks_command_from_ndjson(self, common_user, tmp_path):
+        path = tmp_path / "tasks.ndjson"
+        path.write_text('{"title": "first"}\n\n{"title": "second", "complete": 1}\n')
+        call_command("import_tasks", str(path), email=common_user.email)
+        tasks = Task.objects.filter(user__user=common_user)
+        assert list(tasks.values_list("title", "complete")) == [
+            ("first", False),
+            ("second", True),
+        ]
+
+    def test_task_owner_follows_the_profile(self, common_user, another_user):
+        profile = Profile.objects.get(user=common_user)
+        task = Task.objects.create(user=profile, title="owned")
+        assert task.owner_id == common_user.id
+
+        task = Task.objects.get(pk=task.pk)
+        task.user = Profile.objects.get(user=another_user)
+        task.save(update_fields=["user"])
+        assert Task.objects.get(pk=task.pk).owner_id == another_user.id
+
+    def test_owner_check_loads_no_related_rows(
+        self, api_client, common_user, another_user
+    ):
+        task = Task.objects.create(
+            user=Profile.objects.get(user=common_user), title="owned"
+        )
+        api_client.force_authenticate(user=another_user)
+        url = reverse("task:api-v1:task-detail", kwargs={"pk": task.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.delete(url)
+        assert response.status_code == 403
+        assert len(queries) == 1
+        assert "accounts_profile" not in queries[0]["sql"]
+
+    def test_complete_all_and_undo_all_update_matching_tasks(
+        self, api_client, common_user, another_user
+    ):
+        profile = Profile.objects.get(user=common_user)
+        done = Task.objects.create(user=profile, title="done", complete=True)
+        for i in range(3):
+            Task.objects.create(user=profile, title=f"open {i}")
+        Task.objects.create(user=profile, title="other title")
+        Task.objects.create(user=Profile.objects.get(user=another_user), title="x")
+        done_updated = Task.objects.get(pk=done.pk).updated_date
+        api_client.force_authenticate(user=common_user)
+
+        url = reverse("task:api-v1:task-complete-all")
+        response = api_client.post(url)
+        assert response.status_code == 200
+        assert response.data == {"count": 4}
+        assert Task.objects.filter(owner=common_user, complete=False).count() == 0
+        assert Task.objects.get(title="x").complete is False
+        assert Task.objects.get(pk=done.pk).updated_date == done_updated
+
+        url = reverse("task:api-v1:task-undo-all")
+        response = api_client.post(f"{url}?title=done")
+        assert response.data == {"count": 1}
+        assert Task.objects.get(pk=done.pk).complete is False
+        assert Task.objects.get(pk=done.pk).updated_date > done_updated
+
+    def test_clear_completed_deletes_the_user_completed_tasks(
+        self, api_client, common_user, another_user
+    ):
+        profile = Profile.objects.get(user=common_user)
+        Task.objects.create(user=profile, title="done", complete=True)
+        Task.objects.create(user=profile, title="open")
+        Task.objects.create(
+            user=Profile.objects.get(user=another_user), title="x", complete=True
+        )
+        api_client.force_authenticate(user=common_user)
+        api_client.get(reverse("task:api-v1:task-list"))
+
+        response = api_client.post(reverse("task:api-v1:task-clear-completed"))
+        assert response.data == {"count": 1}
+        assert set(Task.objects.values_list("title", flat=True)) == {"open", "x"}
+        response = api_client.get(reverse("task:api-v1:task-list"))
+        assert response.data["total_objects"] == 2
+
+    def test_fast_delete_refuses_to_skip_reverse_relations(
+        self, common_task, monkeypatch
+    ):
+        # a model with a foreign key to Task would not be cascaded
+        monkeypatch.setattr(Task._meta, "related_objects", [Task._meta.pk])
+        with pytest.raises(RuntimeError):
+            Task.objects.all().fast_delete()
+        assert Task.objects.filter(pk=common_task.pk).exists()
+
+    def test_complete_all_requires_authentication(self, api_client):
+        response = api_client.post(reverse("task:api-v1:task-complete-all"))
+        assert response.status_code == 401
+
+    def test_web_complete_all_reports_the_count(self, client, common_user):
+        profile = Profile.objects.get(user=common_user)
+        for i in range(2):
+            Task.objects.create(user=profile, title=f"open {i}")
+        client.force_login(common_user)
+        response = client.post(reverse("task:complete_all"), follow=True)
+        assert response.status_code == 200
+        assert "2 tasks completed" in response.content.decode()
+        assert not Task.objects.filter(complete=False).exists()
+
+    def test_web_undone_checks_the_owner(self, client, common_user, another_user):
+        task = Task.objects.create(
+            user=Profile.objects.get(user=common_user), title="done", complete=True
+        )
+        client.force_login(another_user)
+        response = client.get(reverse("task:undone_task", kwargs={"pk": task.pk}))
+        assert response.status_code == 403
+        assert Task.objects.get(pk=task.pk).complete is True
@@ -0,0 +1,281 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from todo import weather
+from todo.models import Geocode, normalize_city
+from todo.tasks import refresh_weather
+from todo.weather import (
+    get_weather,
+    get_weathers,
+    WeatherError,
+    WEATHER_KEY,
+    REFRESH_LOCK_KEY,
+    REFRESH_QUEUED_KEY,
+)
+
+WEATHER = {"weather": "Clear", "temp": 21.5}
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    weather.get_coordinates.cache_clear()
+    yield
+    cache.clear()
+    weather.get_coordinates.cache_clear()
+
+
+class FakeResponse:
+    def __init__(self, url):
+        self.url = url
+
+    def json(self):
+        if "/geo/" in self.url:
+            return [{"lat": 35.69, "lon": 51.39}]
+        return {
+            "weather": [{"main": "Clear"}],
+            "main": {"temp": 21.5, "humidity": 30},
+            "sys": {"sunrise": 1700000000, "sunset": 1700040000},
+        }
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    calls = []
+
+    def fake_get(url, **kwargs):
+        calls.append(url)
+        return FakeResponse(url)
+
+    monkeypatch.setattr(weather.openweather, "get", fake_get)
+    return calls
+
+
+@pytest.fixture
+def inline_refresh(monkeypatch):
+    """
+    run the background refresh at once instead of queueing it
+    """
+    monkeypatch.setattr(refresh_weather, "delay", lambda city: refresh_weather(city))
+
+
+class SlowFetch:
+    def __init__(self, delay=0.2, data=WEATHER):
+        self.calls = 0
+        self.delay = delay
+        self.data = data
+        self.lock = threading.Lock()
+
+    def __call__(self, city):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return self.data
+
+
+def expire(city):
+    key = WEATHER_KEY.format(city=city)
+    entry = cache.get(key)
+    entry["fresh_until"] = 0
+    cache.set(key, entry)
+
+
+@pytest.mark.django_db
+class TestWeatherCache:
+
+    def test_concurrent_misses_fetch_once(self):
+        fetch = SlowFetch()
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            results = list(pool.map(lambda _: get_weather("tehran", fetch), range(10)))
+        assert fetch.calls == 1
+        assert results == [WEATHER] * 10
+
+    def test_refresh_is_skipped_while_another_process_refreshes(self):
+        get_weather("tehran", SlowFetch(delay=0))
+        expire("tehran")
+        cache.add(REFRESH_LOCK_KEY.format(city="tehran"), "other", 30)
+        fetch = SlowFetch(data={"weather": "Rain"})
+        entry = cache.get(WEATHER_KEY.format(city="tehran"))
+        assert weather.refresh("tehran", entry, fetch) == WEATHER
+        assert fetch.calls == 0
+
+    def test_stale_value_is_served_and_refreshed_in_background(
+        self, upstream, inline_refresh
+    ):
+        get_weather("tehran", SlowFetch(delay=0))
+        expire("tehran")
+        # the refresh runs inline, it is done on return
+        assert get_weather("tehran") == WEATHER
+        assert get_weather("tehran")["weather"] == "Clear"
+        assert len(upstream) == 2
+        assert cache.get(REFRESH_QUEUED_KEY.format(city="tehran")) is None
+
+    def test_stale_value_is_served_when_the_refresh_can_not_be_queued(
+        self, monkeypatch
+    ):
+        get_weather("tehran", SlowFetch(delay=0))
+        expire("tehran")
+
+        def broker_down(city):
+            raise ConnectionError("broker down")
+
+        monkeypatch.setattr(refresh_weather, "delay", broker_down)
+        assert get_weather("tehran") == WEATHER
+        assert cache.get(REFRESH_QUEUED_KEY.format(city="tehran")) is None
+
+    def test_failed_refresh_serves_the_stale_value(self):
+        get_weather("tehran", SlowFetch(delay=0))
+        expire("tehran")
+        entry = cache.get(WEATHER_KEY.format(city="tehran"))
+
+        def failing(city):
+            raise WeatherError("Could not retrieve weather data.")
+
+        assert weather.refresh("tehran", entry, failing) == WEATHER
+        with pytest.raises(WeatherError):
+            get_weather("shiraz", failing)
+
+    def test_prewarm_refreshes_the_most_requested_cities(self):
+        for name in ("tehran", "shiraz", "tabriz"):
+            Geocode.objects.create(name=name, lat=1, lon=2)
+        for city, hits in (("tehran", 3), ("shiraz", 2), ("tabriz", 1)):
+            for _ in range(hits):
+                get_weather(city, SlowFetch(delay=0))
+        expire("tehran")
+        expire("tabriz")
+
+        fetch = SlowFetch(delay=0, data={"weather": "Rain"})
+        stats = weather.prewarm(limit=2, fetch=fetch)
+        assert stats == {"popular": 2, "refreshed": 1, "failed": 0}
+        assert cache.get(WEATHER_KEY.format(city="tehran"))["data"] == fetch.data
+        assert cache.get(WEATHER_KEY.format(city="tabriz"))["data"] == WEATHER
+        # the counters start over after a run
+        assert weather.prewarm(fetch=fetch)["popular"] == 0
+
+    def test_expiries_are_jittered(self, monkeypatch):
+        monkeypatch.setattr(weather, "WEATHER_TIMEOUT", 1000)
+        expiries = set()
+        for city in range(20):
+            weather.store(str(city), WEATHER)
+            expiries.add(round(cache.get(WEATHER_KEY.format(city=city))["fresh_until"]))
+        assert len(expiries) > 1
+        assert max(expiries) - min(expiries) <= 200 + 1
+
+
+@pytest.mark.django_db
+class TestGeocode:
+
+    def test_coordinates_are_resolved_once(self, upstream):
+        assert weather.get_coordinates("tehran") == (35.69, 51.39)
+        assert Geocode.objects.get(name="tehran").lat == 35.69
+        weather.get_coordinates.cache_clear()
+        assert weather.get_coordinates("tehran") == (35.69, 51.39)
+        assert len(upstream) == 1
+
+    def test_refresh_costs_one_upstream_call(self, upstream, inline_refresh):
+        get_weather("Tehran")
+        expire("tehran")
+        weather.get_coordinates.cache_clear()
+        get_weather("Tehran")
+        assert [url for url in upstream if "/geo/" in url] == [weather.GEOCODING_URL]
+        assert len(upstream) == 3
+
+    def test_normalize_city(self):
+        assert normalize_city("  New   York ") == normalize_city("new york")
+
+
+@pytest.mark.django_db
+class TestWeatherApi:
+
+    def test_weather_api_fetches_once_then_serves_the_cache(self, upstream):
+        url = reverse("task:api-v1:weather")
+        for city in ("Tehran", " tehran  "):
+            response = APIClient().post(url, {"city": city})
+            assert response.status_code == 200
+        assert response.data["weather"] == "Clear"
+        assert response.data["humidity"] == 30
+        assert len(upstream) == 2
+
+    def test_weather_api_reports_upstream_errors(self, monkeypatch):
+        def failing(city):
+            raise WeatherError("Could not retrieve coordinates.")
+
+        monkeypatch.setattr(
+            "todo.api.v1.views.get_weather", lambda city: get_weather(city, failing)
+        )
+        response = APIClient().post(reverse("task:api-v1:weather"), {"city": "nowhere"})
+        assert response.status_code == 500
+        assert response.data == {"error": "Could not retrieve coordinates."}
+
+
+class TestWeatherBatch:
+
+    def test_misses_are_fetched_concurrently(self):
+        get_weather("tehran", SlowFetch(delay=0, data={"weather": "Rain"}))
+        fetch = SlowFetch(delay=0.5)
+        started = time.monotonic()
+        results = get_weathers(["Tehran", "shiraz", "tabriz", "yazd", "SHIRAZ"], fetch)
+        # one after another they would take 1.5 seconds
+        assert time.monotonic() - started < 1.2
+        assert fetch.calls == 3
+        assert results == {
+            "tehran": {"weather": "Rain"},
+            "shiraz": WEATHER,
+            "tabriz": WEATHER,
+            "yazd": WEATHER,
+        }
+
+    def test_failed_cities_map_to_their_error(self):
+        def fetch(city):
+            if city == "nowhere":
+                raise WeatherError("Could not retrieve coordinates.")
+            return WEATHER
+
+        results = get_weathers(["tehran", "nowhere"], fetch)
+        assert results["tehran"] == WEATHER
+        assert isinstance(results["nowhere"], WeatherError)
+
+
+@pytest.mark.django_db(transaction=True)
+class TestWeatherBatchApi:
+
+    def test_batch_returns_every_city_in_order(self, upstream):
+        url = reverse("task:api-v1:weather-batch")
+        response = APIClient().post(
+            url, {"cities": ["Tehran", "shiraz"]}, format="json"
+        )
+        assert response.status_code == 200
+        assert [result["city"] for result in response.data["results"]] == [
+            "Tehran",
+            "shiraz",
+        ]
+        assert response.data["results"][0]["weather"] == "Clear"
+
+    def test_batch_reports_failed_cities(self, monkeypatch):
+        def failing(url, **kwargs):
+            raise requests.exceptions.ConnectionError("down")
+
+        monkeypatch.setattr(weather.openweather, "get", failing)
+        get_weather("tehran", SlowFetch(delay=0))
+        url = reverse("task:api-v1:weather-batch")
+        response = APIClient().post(
+            url, {"cities": ["tehran", "nowhere"]}, format="json"
+        )
+        assert response.status_code == 207
+        assert response.data["results"][0]["weather"] == "Clear"
+        assert response.data["results"][1] == {
+            "city": "nowhere",
+            "error": "Could not retrieve weather data.",
+        }
+
+    def test_batch_validates_the_cities(self):
+        url = reverse("task:api-v1:weather-batch")
+        response = APIClient().post(url, {"cities": []}, format="json")
+        assert response.status_code == 400
@@ -10,5 +10,12 @@ urlpatterns = [
     path("complete/<int:pk>/", views.TaskCompleteView.as_view(), name="complete_task"),
     path("delete/<int:pk>/", views.TaskDeleteView.as_view(), name="delete_task"),
     path("undone/<int:pk>/", views.TaskUnDoneView.as_view(), name="undone_task"),
+    path("complete-all/", views.TaskCompleteAllView.as_view(), name="complete_all"),
+    path("undo-all/", views.TaskUndoAllView.as_view(), name="undo_all"),
+    path(
+        "clear-completed/",
+        views.TaskClearCompletedView.as_view(),
+        name="clear_completed",
+    ),
     path("api/v1/", include("todo.api.v1.urls")),
 ]
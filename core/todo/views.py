@@ -1,9 +1,14 @@
+from functools import partial
+
 from django.views.generic.list import ListView
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
-from .models import Task
-from accounts.models import Profile
+from .models import Task, TaskQuerySet
+from .cache import get_task_list, user_scope, invalidate_task_lists
+from .api.v1.filters import TaskFilter
 from .forms import TaskForm
 from django.views import View
+from django.contrib import messages
+from django.db import transaction
 from django.shortcuts import redirect
 from django.core.exceptions import PermissionDenied
 from django.contrib.auth.mixins import LoginRequiredMixin
@@ -17,11 +22,15 @@ class TaskListView(LoginRequiredMixin, ListView):
     model = Task
     context_object_name = "tasks"
     template_name = "todo/list_task.html"
+    query_budget = 5
 
     def get_queryset(self):
-        profile = Profile.objects.get(user=self.request.user)
-        tasks = Task.objects.filter(user=profile)
-        return tasks
+        user = self.request.user
+        return get_task_list(
+            user_scope(user.id),
+            "html",
+            lambda: list(Task.objects.filter(owner=user)),
+        )
 
 
 class TaskCreateView(LoginRequiredMixin, CreateView):
@@ -34,8 +43,7 @@ class TaskCreateView(LoginRequiredMixin, CreateView):
     success_url = "/"
 
     def form_valid(self, form):
-        profile = Profile.objects.get(user=self.request.user)
-        form.instance.user = profile
+        form.instance.user = self.request.profile
         return super(TaskCreateView, self).form_valid(form)
 
     def form_invalid(self, form):
@@ -54,7 +62,9 @@ class TaskUpdateView(LoginRequiredMixin, UpdateView):
 
     def get_object(self, queryset=None):
         obj = super().get_object(queryset)
-        if obj.user.user != self.request.user:  # Enforce that only the creator can edit
+        if (
+            obj.owner_id != self.request.user.id
+        ):  # Enforce that only the creator can edit
             raise PermissionDenied("You don't have permission to edit this task.")
         return obj
 
@@ -68,13 +78,13 @@ class TaskCompleteView(LoginRequiredMixin, View):
     success_url = "/"
 
     def get(self, request, *args, **kwargs):
-        task = Task.objects.get(id=kwargs.get("pk"))
+        task = Task.objects.only("owner_id").get(id=kwargs.get("pk"))
         if (
-            task.user.user != self.request.user
+            task.owner_id != self.request.user.id
         ):  # Enforce that only the creator can complete task
             raise PermissionDenied("You don't have permission to edit this task.")
-        task.complete = True
-        task.save()
+        Task.objects.filter(pk=task.pk).set_complete(True)
+        invalidate_task_lists(request.user.id)
         return redirect(self.success_url)
 
 
@@ -93,7 +103,7 @@ class TaskDeleteView(LoginRequiredMixin, DeleteView):
     def post(self, request, *args, **kwargs):
         self.object = self.get_object()
         if (
-            self.object.user.user != self.request.user
+            self.object.owner_id != self.request.user.id
         ):  # Enforce that only the creator can edit
             raise PermissionDenied("You don't have permission to edit this task.")
         self.object.delete()
@@ -109,7 +119,49 @@ class TaskUnDoneView(LoginRequiredMixin, View):
     success_url = "/"
 
     def get(self, request, *args, **kwargs):
-        task = Task.objects.get(id=kwargs.get("pk"))
-        task.complete = False
-        task.save()
+        task = Task.objects.only("owner_id").get(id=kwargs.get("pk"))
+        if task.owner_id != self.request.user.id:
+            raise PermissionDenied("You don't have permission to edit this task.")
+        Task.objects.filter(pk=task.pk).set_complete(False)
+        invalidate_task_lists(request.user.id)
         return redirect(self.success_url)
+
+
+class TaskBulkStateView(LoginRequiredMixin, View):
+    """
+    Apply one state change to every task of the user matching the TaskFilter
+    params of the query string, with a single statement
+    """
+
+    success_url = "/"
+    message = "{count} tasks changed"
+    # applied to the filtered queryset, returns the changed count
+    operation = None
+
+    def post(self, request, *args, **kwargs):
+        filterset = TaskFilter(
+            request.GET, queryset=Task.objects.filter(owner=request.user)
+        )
+        if not filterset.is_valid():
+            messages.error(request, "invalid filter")
+            return redirect(self.success_url)
+        with transaction.atomic():
+            count = self.operation(filterset.qs)
+            invalidate_task_lists(request.user.id)
+        messages.success(request, self.message.format(count=count))
+        return redirect(self.success_url)
+
+
+class TaskCompleteAllView(TaskBulkStateView):
+    message = "{count} tasks completed"
+    operation = staticmethod(partial(TaskQuerySet.set_complete, complete=True))
+
+
+class TaskUndoAllView(TaskBulkStateView):
+    message = "{count} tasks marked as not done"
+    operation = staticmethod(partial(TaskQuerySet.set_complete, complete=False))
+
+
+class TaskClearCompletedView(TaskBulkStateView):
+    message = "{count} completed tasks deleted"
+    operation = staticmethod(TaskQuerySet.clear_completed)
@@ -0,0 +1,334 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import (
+    Future,
+    ThreadPoolExecutor,
+    TimeoutError as FutureTimeoutError,
+)
+from functools import lru_cache
+from itertools import islice
+from uuid import uuid4
+
+import pytz
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connections, transaction
+from persiantools.jdatetime import JalaliDateTime
+
+from core.http import HttpClient
+from .models import Geocode, normalize_city
+
+logger = logging.getLogger(__name__)
+
+GEOCODING_URL = "http://api.openweathermap.org/geo/1.0/direct"
+WEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+
+# pooled connections, timeouts, retries and circuit breaker of the calls to
+# OpenWeather, while the circuit is open refreshes fail at once and the
+# stale entries keep being served
+openweather = HttpClient(timeout=(3.05, 5))
+
+# an entry is fresh for WEATHER_TIMEOUT seconds, give or take the jitter so
+# entries cached together do not all expire together, and is kept as a
+# stale fallback for WEATHER_STALE_TIMEOUT more seconds
+WEATHER_KEY = "weather:{city}"
+WEATHER_TIMEOUT = 1200
+WEATHER_TIMEOUT_JITTER = 0.1
+WEATHER_STALE_TIMEOUT = 60 * 60
+
+# one refresh of a city at a time across every process
+REFRESH_LOCK_KEY = "weather:lock:{city}"
+# a stale city waiting for its background refresh
+REFRESH_QUEUED_KEY = "weather:queued:{city}"
+REFRESH_LOCK_TIMEOUT = 30
+# how long a request without any cached value waits for another refresh
+REFRESH_WAIT = 5
+REFRESH_POLL_INTERVAL = 0.05
+
+# requests of every city since the last pre-warm, see prewarm()
+HITS_KEY = "weather:hits:{city}"
+HITS_TIMEOUT = 60 * 60 * 24
+PREWARM_CITIES = 50
+PREWARM_INTERVAL = 60 * 10
+
+# coordinates never change, the most used ones are kept in process
+GEOCODE_LRU_SIZE = 1024
+
+# threads fetching the cache misses of get_weathers and aget_weather, shared
+# by the requests of the process so they stay bounded
+BATCH_WORKERS = 8
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+
+# refreshes running in this process, by city
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class WeatherError(Exception):
+    pass
+
+
+@lru_cache(maxsize=GEOCODE_LRU_SIZE)
+def get_coordinates(city):
+    """
+    lat, lon of a normalized city name, from the in-process LRU, then the
+    Geocode table, then the OpenWeather geocoding api on first use
+    """
+    geocode = Geocode.objects.filter(name=city).values_list("lat", "lon").first()
+    if geocode is not None:
+        return geocode
+    lat, lon = geocode_city(city)
+    try:
+        with transaction.atomic():
+            Geocode.objects.create(name=city, lat=lat, lon=lon)
+    except IntegrityError:
+        # resolved by a concurrent request in the meantime
+        pass
+    return lat, lon
+
+
+def geocode_city(city):
+    response = openweather.get(
+        GEOCODING_URL, params={"q": city, "appid": settings.OPENWEATHER_API_KEY}
+    )
+    try:
+        location = response.json()[0]
+        return location["lat"], location["lon"]
+    except (ValueError, LookupError, TypeError):
+        raise WeatherError("Could not retrieve coordinates.")
+
+
+def fetch_weather(city):
+    """
+    Current weather of a city from OpenWeather, sunrise and sunset in Jalali
+    Tehran time
+    """
+    try:
+        lat, lon = get_coordinates(city)
+        response = openweather.get(
+            WEATHER_URL,
+            params={
+                "lat": lat,
+                "lon": lon,
+                "appid": settings.OPENWEATHER_API_KEY,
+                "units": "metric",
+            },
+        ).json()
+        tehran = pytz.timezone("Asia/Tehran")
+        return {
+            "weather": response["weather"][0]["main"],
+            "temp": response["main"]["temp"],
+            "humidity": response["main"]["humidity"],
+            "sys_sunrise": JalaliDateTime.fromtimestamp(
+                response["sys"]["sunrise"], tehran
+            ).strftime("%Y-%m-%d %H:%M:%S"),
+            "sys_sunset": JalaliDateTime.fromtimestamp(
+                response["sys"]["sunset"], tehran
+            ).strftime("%Y-%m-%d %H:%M:%S"),
+        }
+    except requests.exceptions.RequestException as err:
+        logger.warning("weather of %s failed: %s", city, err)
+        raise WeatherError("Could not retrieve weather data.")
+    except (ValueError, LookupError, TypeError):
+        raise WeatherError("Could not retrieve weather data.")
+
+
+def get_weather(city, fetch=fetch_weather):
+    """
+    Cached weather of a city, stale while revalidate: a stale entry is
+    served at once and refreshed by a celery task. A missing entry is
+    fetched by a single caller, in this process and across processes, the
+    others wait up to REFRESH_WAIT seconds for it.
+    """
+    city = normalize_city(city)
+    count_request(city)
+    entry = cache.get(WEATHER_KEY.format(city=city))
+    if entry is not None:
+        if entry["fresh_until"] <= time.time():
+            schedule_refresh(city)
+        return entry["data"]
+
+    with _inflight_lock:
+        future = _inflight.get(city)
+        leader = future is None
+        if leader:
+            future = _inflight[city] = Future()
+    if not leader:
+        try:
+            return future.result(timeout=REFRESH_WAIT)
+        except FutureTimeoutError:
+            raise WeatherError("Could not retrieve weather data.")
+
+    try:
+        data = refresh(city, entry, fetch)
+    except Exception as exc:
+        future.set_exception(exc)
+        raise
+    else:
+        future.set_result(data)
+        return data
+    finally:
+        with _inflight_lock:
+            del _inflight[city]
+
+
+async def aget_weather(city, fetch=fetch_weather):
+    """
+    get_weather for async views. It runs in a thread of the batch pool, not
+    the event loop and not the single thread of the thread sensitive ORM
+    calls, so the requests waiting on OpenWeather do not queue behind each
+    other.
+    """
+    return await sync_to_async(
+        fetch_in_thread, thread_sensitive=False, executor=get_batch_pool()
+    )(city, fetch)
+
+
+def get_weathers(cities, fetch=fetch_weather):
+    """
+    Weather of several cities by normalized name, the cache hits are read
+    with one get_many and the misses fetched concurrently, so a batch costs
+    about one upstream round trip. A city that failed maps to its
+    WeatherError.
+    """
+    names = list(dict.fromkeys(normalize_city(city) for city in cities))
+    entries = cache.get_many([WEATHER_KEY.format(city=name) for name in names])
+    results = {}
+    misses = []
+    for name in names:
+        entry = entries.get(WEATHER_KEY.format(city=name))
+        if entry is None:
+            misses.append(name)
+            continue
+        count_request(name)
+        if entry["fresh_until"] <= time.time():
+            schedule_refresh(name)
+        results[name] = entry["data"]
+
+    pool = get_batch_pool()
+    futures = {name: pool.submit(fetch_in_thread, name, fetch) for name in misses}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except WeatherError as err:
+            results[name] = err
+    return results
+
+
+def get_batch_pool():
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            _batch_pool = ThreadPoolExecutor(
+                max_workers=BATCH_WORKERS, thread_name_prefix="weather"
+            )
+        return _batch_pool
+
+
+def fetch_in_thread(city, fetch):
+    try:
+        return get_weather(city, fetch)
+    finally:
+        # the geocode lookups opened a connection of this pool thread
+        connections.close_all()
+
+
+def refresh(city, entry, fetch):
+    lock_key = REFRESH_LOCK_KEY.format(city=city)
+    token = uuid4().hex
+    if cache.add(lock_key, token, REFRESH_LOCK_TIMEOUT):
+        try:
+            return store(city, fetch(city))
+        except WeatherError:
+            if entry is not None:
+                return entry["data"]
+            raise
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+    # another process is refreshing the city
+    if entry is not None:
+        return entry["data"]
+    deadline = time.monotonic() + REFRESH_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(REFRESH_POLL_INTERVAL)
+        entry = cache.get(WEATHER_KEY.format(city=city))
+        if entry is not None:
+            return entry["data"]
+        if cache.get(lock_key) is None:
+            break
+    # the other refresh failed or is too slow
+    return store(city, fetch(city))
+
+
+def schedule_refresh(city):
+    """
+    queue one background refresh of a stale city
+    """
+    from .tasks import refresh_weather
+
+    queued_key = REFRESH_QUEUED_KEY.format(city=city)
+    if not cache.add(queued_key, True, REFRESH_LOCK_TIMEOUT):
+        return
+    try:
+        refresh_weather.delay(city)
+    except Exception as err:
+        # the stale value is still served, the next request retries
+        logger.warning("could not queue the weather refresh of %s: %s", city, err)
+        cache.delete(queued_key)
+
+
+def count_request(city):
+    key = HITS_KEY.format(city=city)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, HITS_TIMEOUT)
+
+
+def prewarm(limit=PREWARM_CITIES, fetch=fetch_weather):
+    """
+    Refresh the most requested cities since the last run before they go
+    stale. Every geocoded city is a candidate, the request counters are
+    reset after they are read.
+    """
+    hits = {}
+    names = Geocode.objects.values_list("name", flat=True).iterator(chunk_size=2000)
+    while chunk := list(islice(names, 2000)):
+        keys = {HITS_KEY.format(city=name): name for name in chunk}
+        for key, count in cache.get_many(list(keys)).items():
+            hits[keys[key]] = count
+        cache.delete_many(list(keys))
+    popular = sorted(hits, key=hits.get, reverse=True)[:limit]
+
+    refreshed = failed = 0
+    # refreshing the entries that would go stale before the next run
+    horizon = time.time() + PREWARM_INTERVAL
+    for city in popular:
+        entry = cache.get(WEATHER_KEY.format(city=city))
+        if entry is not None and entry["fresh_until"] > horizon:
+            continue
+        try:
+            refresh(city, entry, fetch)
+            refreshed += 1
+        except WeatherError:
+            failed += 1
+    return {"popular": len(popular), "refreshed": refreshed, "failed": failed}
+
+
+def store(city, data):
+    timeout = WEATHER_TIMEOUT * random.uniform(
+        1 - WEATHER_TIMEOUT_JITTER, 1 + WEATHER_TIMEOUT_JITTER
+    )
+    cache.set(
+        WEATHER_KEY.format(city=city),
+        {"data": data, "fresh_until": time.time() + timeout},
+        timeout + WEATHER_STALE_TIMEOUT,
+    )
+    return data